@@ -55,11 +55,16 @@ mirrored in a local archive for further processing and analysis.
 #%% Import modules and set up environment
 # operating system muodules to work with filenames and paths
 import os
+# built-in sys module to find html_transforms.py beside this script
+import sys
 from os.path import join, expanduser, normpath
 # built-in urllib module to work with URLs
 from urllib.parse import urlparse, urljoin, urlunparse
 # requests module to retrieve HTML files over the internet
 import requests
+# errors raised while reading a body that was cut off mid-stream
+from urllib3.exceptions import ProtocolError
+from http.client import IncompleteRead
 # built-in regular expression module to work with patterns of text
 import re
 # BeautifulSoup module to parse, analyze, and write HTML
@@ -69,27 +74,312 @@ from bs4 import BeautifulSoup, UnicodeDammit
 import pandas as pd
 # built-in pickle module to serialize and store intermediate data structures
 import pickle
+# built-in json module to store manifests and other small records
+import json
+# built-in csv module to append records to logs
+import csv
+# built-in zlib module to compute CRC-32 checksums (as in zip archives)
+import zlib
+# built-in sqlite3 module to persist crawl state in a single file
+import sqlite3
+# built-in zipfile module to read and write zipped mirror archives
+import zipfile
 # tqdm module to visualize progress oover iterators
 from tqdm import tqdm
+# built-in functools module to memoize repeated computations
+from functools import lru_cache
+# built-in modules to retrieve many files concurrently and pace retries
+import threading
+import time
+import random
+from concurrent.futures import ThreadPoolExecutor, as_completed, wait, \
+   FIRST_COMPLETED
+# built-in modules to transform many documents in parallel processes
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from collections import deque
+# built-in collections.abc module to define dict-like classes
+from collections.abc import MutableMapping, ItemsView, ValuesView
 
 # global, session-specific pandas option
 pd.set_option('display.expand_frame_repr', False) # show/wrap all DF columns
 
 #%% 1. Functions for operating on URLs and paths
 
+# A single requests.Session, shared across the whole crawl, keeps connections
+# to www.cdc.gov and wwwnc.cdc.gov alive between requests instead of opening
+# a new TCP/TLS connection for each URL; its HTTPAdapter keeps a pool of
+# connections for each host, sized to match the threads that mirror files
+# concurrently. Accept-Encoding offers gzip and deflate (and br, if a brotli
+# module is installed), which requests decompresses transparently.
+_http_session = None
+_http_session_lock = threading.Lock()
+
+def configure_http_session(pool_connections=4, pool_maxsize=16, headers=None):
+   """
+   Construct shared HTTP session used by get_html_from_url and mirror_raw_html.
+   
+   Parameters
+   pool_connections : int
+      number of hosts for which to keep a pool of connections
+   pool_maxsize : int
+      maximum number of connections kept alive for each host
+   headers : dict
+      additional headers to send with every request, e.g., User-Agent
+
+   Returns
+   requests.Session
+   """
+   global _http_session
+   from requests.adapters import HTTPAdapter
+   from urllib3.util import make_headers
+   
+   session = requests.Session()
+   adapter = HTTPAdapter(pool_connections=pool_connections,
+                         pool_maxsize=pool_maxsize)
+   session.mount('https://', adapter)
+   session.mount('http://', adapter)
+   session.headers.update(make_headers(keep_alive=True, accept_encoding=True))
+   if headers:
+      session.headers.update(headers)
+   with _http_session_lock:
+      old_session, _http_session = _http_session, session
+   if old_session is not None:
+      old_session.close()
+   return session
+
+def get_http_session():
+   "Return shared HTTP session, constructing it with defaults if necessary."
+   with _http_session_lock:
+      session = _http_session
+   return configure_http_session() if session is None else session
+
+# Each host gets a token bucket that paces requests, plus a record of recent
+# response latencies. Rates adapt additively up while requests succeed and
+# are halved on timeouts and server errors (including 429), and the timeout
+# for each host follows its observed tail latency (the 99th percentile, times
+# a safety factor), so that neither rate nor timeout needs hand-tuning for
+# www.cdc.gov versus the more sluggish wwwnc.cdc.gov.
+HOST_LIMIT_DEFAULTS = dict(
+   rate=4.0,         # initial requests per second
+   min_rate=0.5, max_rate=32.0, 
+   rate_step=0.1,    # additive increase after each success
+   burst=4,          # maximum tokens that can accumulate
+   timeout=8.0,      # timeout in seconds until enough latencies observed
+   min_timeout=2.0, max_timeout=60.0,
+   timeout_factor=4, # timeout as multiple of 99th-percentile latency
+   min_samples=20, window=500)
+_host_limits = {}
+_host_limits_lock = threading.Lock()
+
+def host_limit(host):
+   "Return (shared) adaptive rate limit state for host, creating if needed."
+   with _host_limits_lock:
+      if host not in _host_limits:
+         settings = dict(HOST_LIMIT_DEFAULTS)
+         _host_limits[host] = dict(
+            settings, tokens=float(settings['burst']), 
+            updated=time.monotonic(), 
+            latencies=deque(maxlen=settings['window']), 
+            lock=threading.Lock())
+      return _host_limits[host]
+
+def reset_host_limits():
+   "Forget rate limit state of all hosts, e.g., between benchmark runs."
+   with _host_limits_lock:
+      _host_limits.clear()
+
+def configure_host_limit(host, **settings):
+   "Override settings (see HOST_LIMIT_DEFAULTS) for one host, e.g., rate=2."
+   limit = host_limit(host)
+   with limit['lock']:
+      limit.update(settings)
+   return limit
+
+def host_acquire(host):
+   "Wait until host's token bucket allows another request, and take a token."
+   limit = host_limit(host)
+   while True:
+      with limit['lock']:
+         now = time.monotonic()
+         limit['tokens'] = min(limit['burst'], limit['tokens'] + 
+                               (now - limit['updated']) * limit['rate'])
+         limit['updated'] = now
+         if limit['tokens'] >= 1:
+            limit['tokens'] -= 1
+            return
+         wait = (1 - limit['tokens']) / limit['rate']
+      time.sleep(wait)
+
+def host_observe(host, seconds, outcome):
+   "Record latency and outcome (see classify_fetch) of a request to host."
+   limit = host_limit(host)
+   with limit['lock']:
+      if outcome in ('ok', 'client'):
+         limit['latencies'].append(seconds)
+         limit['rate'] = min(limit['max_rate'], 
+                             limit['rate'] + limit['rate_step'])
+      elif outcome in ('timeout', 'server'):
+         limit['rate'] = max(limit['min_rate'], limit['rate'] / 2)
+
+def latency_quantile(latencies, q):
+   "Quantile q (0-1) of a sequence of latencies, by nearest rank."
+   ordered = sorted(latencies)
+   return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+def host_timeout(host):
+   "Current adaptive timeout in seconds for requests to host."
+   limit = host_limit(host)
+   with limit['lock']:
+      if len(limit['latencies']) < limit['min_samples']:
+         return limit['timeout']
+      p99 = latency_quantile(limit['latencies'], 0.99)
+      return min(limit['max_timeout'], 
+                 max(limit['min_timeout'], p99 * limit['timeout_factor']))
+
+def host_limits_summary():
+   "Summarize current rate, timeout, and latency percentiles for each host."
+   with _host_limits_lock:
+      hosts = list(_host_limits)
+   summary = []
+   for host in hosts:
+      limit = host_limit(host)
+      with limit['lock']:
+         latencies = list(limit['latencies'])
+         rate = limit['rate']
+      summary.append(dict(
+         host=host, rate=rate, timeout=host_timeout(host), n=len(latencies),
+         **{f'p{q}': (latency_quantile(latencies, q / 100) if latencies 
+                      else None) for q in (50, 90, 99)}))
+   return pd.DataFrame(summary)
+
+# Failed requests fall into classes: timeouts, dropped or reset connections,
+# and server errors (5xx, or 429 Too Many Requests) are usually transient and
+# worth retrying; other client errors (e.g., 404) are not. Retries wait for a
+# randomly jittered, exponentially increasing delay (or for Retry-After, if
+# the server sends it) and stop after max_tries or once budget is spent.
+RETRY_CLASSES = {'timeout', 'connection', 'server'}
+# a body cut off (or stalled, or undecodable) after a response has arrived
+# (retried by mirror_raw_html); requests reports a read timeout mid-body as
+# ConnectionError
+STREAM_ERRORS = (requests.exceptions.ChunkedEncodingError, 
+                 requests.exceptions.ConnectionError,
+                 requests.exceptions.ContentDecodingError, ProtocolError,
+                 IncompleteRead)
+
+def classify_fetch(response=None, error=None):
+   """Classify outcome of a request as 'ok', 'timeout', 'connection', 
+   'server', 'client', or 'error' (anything else)."""
+   if error is not None:
+      if isinstance(error, requests.exceptions.Timeout):
+         return 'timeout'
+      if isinstance(error, (requests.exceptions.ConnectionError,
+                            requests.exceptions.ChunkedEncodingError,
+                            ConnectionResetError)):
+         return 'connection'
+      return 'error'
+   if response.status_code >= 500 or response.status_code == 429:
+      return 'server'
+   if response.status_code >= 400:
+      return 'client'
+   return 'ok'
+
+def retry_delay(attempt, backoff=0.5, max_backoff=30, response=None):
+   "Seconds to wait before retry number attempt (0, 1, ...), with full jitter."
+   retry_after = None if response is None else response.headers.get('Retry-After')
+   if retry_after is not None and retry_after.isdigit():
+      return min(float(retry_after), max_backoff)
+   return random.uniform(0, min(max_backoff, backoff * 2 ** attempt))
+
+def fetch_url(url, timeout=None, headers=None, stream=False, max_tries=5,
+              backoff=0.5, max_backoff=30, budget=120):
+   """
+   Retrieve URL with shared HTTP session, retrying transient failures.
+   
+   Parameters
+   url : str
+      absolute URL to retrieve
+   timeout : float
+      seconds to wait for each response; None to adapt to host (host_timeout)
+   headers : dict
+      additional headers for this request, e.g., conditional_headers()
+   stream : bool
+      passed to requests; if True, caller reads (and closes) response body
+   max_tries : int
+      maximum number of attempts
+   backoff, max_backoff : float
+      base and ceiling in seconds for jittered exponential delay
+   budget : float
+      seconds after which no further retry starts
+
+   Returns
+   requests.Response
+      final response, which may still carry an error status
+   
+   Raises the last requests exception if no response was ever received.
+
+   If a redirect map is loaded (see load_redirect_map), a URL known to 
+   redirect is requested at its final location instead.
+   """
+   target = redirect_target(url)
+   host = urlparse(target).netloc
+   request_url = replay_url(target)
+   start = time.monotonic()
+   for attempt in range(max_tries):
+      response, error = None, None
+      host_acquire(host)
+      sent = time.monotonic()
+      try:
+         response = get_http_session().get(request_url, 
+            timeout=host_timeout(host) if timeout is None else timeout,
+            headers=headers, stream=stream)
+         outcome = classify_fetch(response=response)
+      except requests.exceptions.RequestException as e:
+         error, outcome = e, classify_fetch(error=e)
+      host_observe(host, time.monotonic() - sent, outcome)
+      if outcome not in RETRY_CLASSES:
+         break
+      delay = retry_delay(attempt, backoff, max_backoff, response)
+      if (attempt + 1 == max_tries or 
+          time.monotonic() - start + delay > budget):
+         break
+      if response is not None:
+         response.close()
+      time.sleep(delay)
+   if _fetch_log['writer'] is not None:
+      record = fetch_record(url, start, attempt, response, outcome)
+      if response is None:
+         log_fetch(record)
+      elif stream and response.ok and response.status_code not in (204, 304):
+         response.fetch_record = record # logged once body is read
+      else:
+         log_fetch(record, 0 if stream else len(response.content))
+   if response is None:
+      raise error
+   if note_redirect(url, target, response):
+      # final location recorded earlier is gone; request original URL
+      response.close()
+      return fetch_url(url, timeout, headers, stream, max_tries, backoff, 
+                       max_backoff, budget)
+   if _http_record['store'] is not None:
+      record_http_response(response)
+   return response
+
 # requests.get(url).text decodes to utf-8, which could mismatch
 # requests.get(url).content is bytestream
 # UnicodeDammit(content, ["utf-8", "windows-1252"]) tries to improve match
 #    tries utf-8 first, but falls back to windows-1252 if there's an error
 #    .unicode_markup appears to be the same as .markup
 # reduce all non-HTML whitespace to single space character
-def get_html_from_url(url, print_url = False, timeout = 1):
+def get_html_from_url(url, print_url = False, timeout = None):
    """
    Parameters
    url : str
       Absolute URL from which to retrieve HTML document.
 
-   1. Absolute URL passes to requests.get
+   1. Absolute URL passes to fetch_url, which retries transient failures
+      (or, if an HTTP cache is open, to cached_content; see http_cache)
    2. bytes get() result passes to UnicodeDammit
    3. UnicodeDammit attempts decoding to UTF-8 else to Windows-1252
    4. unicode_markup is (one hopes) clean UTF-8-encoded HTML
@@ -99,22 +389,23 @@ def get_html_from_url(url, print_url = False, timeout = 1):
    str
       UTF-8 encoded HTML string with minimal white space.
    
-   requests.get(timeout=5) is hardcoded to deal with sluggish EID responses
+   timeout=None adapts to observed latency of each host (see host_timeout),
+   replacing timeouts hardcoded to deal with sluggish EID responses
+   Returns '' if the request ultimately fails, including error statuses
    """
    if(print_url):
       print(f'Retrieving URL {url}')
    try:
+      content = cached_content(url, timeout=timeout)
       html = re.sub(r'\s+', ' ', 
-         UnicodeDammit(
-            requests.get(url, timeout=timeout).content, 
-            ["utf-8", "windows-1252"]).unicode_markup)
+         UnicodeDammit(content, ["utf-8", "windows-1252"]).unicode_markup)
    except:
       html = ''
    return html
 
 # curried version that prints URL
 def get_html_from_url_(url):
-   return get_html_from_url(url, print_url = True, timeout = 5)
+   return get_html_from_url(url, print_url = True)
 
 def process_aTag(aTag, base_url='https://www.cdc.gov'):
    """
@@ -128,6 +419,20 @@ def process_aTag(aTag, base_url='https://www.cdc.gov'):
    except:
       print('Unable to extract href from anchor.')
       return None
+   return process_href(a_href, base_url, aTag.get_text('|', strip = True))
+
+def process_href(a_href, base_url, a_text):
+   "Construct process_aTag's dict from href, base URL, and anchor text."
+   a_url, a_path, a_basename, m_path = normalize_href(a_href, base_url)
+   return dict(base=base_url, href=a_href, url=a_url, path=a_path, 
+      filename=a_basename, mirror_path=m_path, string=a_text)
+
+# The same few hrefs (navigation, journal links) recur on every page, and all
+# anchors on a page share a base URL, so normalization is memoized
+@lru_cache(maxsize=1 << 18)
+def normalize_href(a_href, base_url):
+   """Resolve href against base URL; return tuple (url, path, filename, 
+   mirror_path) as in process_aTag."""
    joined = urljoin(base_url, a_href)
    parsed = urlparse(joined)
    parsed = parsed._replace(scheme='https', params='', query='', fragment='')
@@ -145,9 +450,116 @@ def process_aTag(aTag, base_url='https://www.cdc.gov'):
    else:
       m_filename = a_basename
    m_path = os.path.join(a_dirname, m_filename)
-   a_text = aTag.get_text('|', strip = True)
-   return dict(base=base_url, href=a_href, url=a_url, path=a_path, 
-      filename=a_basename, mirror_path=m_path, string=a_text)
+   return a_url, a_path, a_basename, m_path
+
+def process_hrefs(hrefs, bases, strings=''):
+   """
+   Construct process_aTag's records for many anchors at once, normalizing
+   each distinct (href, base) pair only once.
+
+   Parameters
+   hrefs : iterable of str
+      hypertext references
+   bases : str or iterable of str
+      base URL for all hrefs, or for each href
+   strings : str or iterable of str
+      anchor text for all hrefs, or for each href
+
+   Returns
+   pandas.DataFrame
+      base, href, url, path, filename, mirror_path, string
+   """
+   frame = pd.DataFrame(dict(href=list(hrefs)))
+   frame['base'] = bases if isinstance(bases, str) else list(bases)
+   frame['string'] = strings if isinstance(strings, str) else list(strings)
+   pairs = frame[['href', 'base']].drop_duplicates()
+   pairs = pairs.join(pd.DataFrame(
+      [normalize_href(a_href, base_url) 
+       for a_href, base_url in zip(pairs['href'], pairs['base'])],
+      columns=['url', 'path', 'filename', 'mirror_path'], index=pairs.index))
+   return frame.merge(pairs, on=['href', 'base'], how='left')[
+      ['base', 'href', 'url', 'path', 'filename', 'mirror_path', 'string']]
+
+# Building a full BeautifulSoup tree for a table-of-contents page (up to
+# ~475 KB for EID issues) only to call find_all('a', ...) spends most of its
+# time in Python objects for elements that are never used. extract_anchors
+# lets lxml's C parser stream the page, fed in chunks, and hands back only
+# <a> elements, as the same records as process_aTag. Each anchor, and every
+# element that closed before it, is cleared as soon as it is read, so only 
+# the open part of the tree is held in memory.
+def element_string(element):
+   """Return sole text of lxml element, as bs4's Tag.string: its one text 
+   node, or that of its one child element (recursively); otherwise None."""
+   children = list(element)
+   if not children:
+      return element.text
+   if len(children) == 1 and not element.text and not children[0].tail:
+      return element_string(children[0])
+   return None
+
+def iter_anchors(html, href=True, string=None, chunk_size=65536):
+   "Yield (href, text) for anchors in HTML; see extract_anchors."
+   from lxml import etree
+   
+   if not html:
+      return
+   parser = etree.HTMLPullParser(events=('end',), tag='a')
+   for k in range(0, len(html), chunk_size):
+      parser.feed(html[k:k + chunk_size])
+      yield from _read_anchors(parser, href, string)
+   parser.close()
+   yield from _read_anchors(parser, href, string)
+
+def _read_anchors(parser, href, string):
+   # drain anchors parsed so far, clearing them and all closed elements
+   for _, aTag in parser.read_events():
+      a_href = aTag.get('href')
+      texts = list(aTag.itertext())
+      a_string = element_string(aTag) if string is not None else None
+      aTag.clear(keep_tail=True)
+      for element in [aTag, *aTag.iterancestors()]:
+         while element.getprevious() is not None:
+            del element.getparent()[0]
+      if a_href is None or (href is not True and not href.search(a_href)):
+         continue
+      if string is not None and not (a_string is not None and 
+                                     string.search(a_string)):
+         continue
+      yield a_href, '|'.join(text.strip() for text in texts if text.strip())
+
+def extract_anchors(html, base_url, href=True, string=None):
+   """
+   Extract anchor records from HTML without constructing a soup.
+
+   Parameters
+   html : str or bytes
+      HTML document, e.g., from get_html_from_url
+   base_url : str
+      URL of document, against which hrefs are resolved
+   href : True or compiled regular expression
+      True for all anchors with href; otherwise, like find_all(href=regex),
+      anchors whose href matches (re.search)
+   string : compiled regular expression
+      like find_all(string=regex), anchors whose string matches, where (as
+      bs4's .string) an anchor with several text nodes or child elements 
+      has no string; see element_string
+
+   Returns
+   list of dict
+      same keys and values as process_aTag, in document order
+   """
+   return [process_href(a_href, base_url, a_text) 
+           for a_href, a_text in iter_anchors(html, href, string)]
+
+def anchors_dframe(htmls, base_urls, href=True, string=None):
+   """Extract anchors from many HTML documents (with corresponding base URLs)
+   into a single DataFrame, as for reviewing all anchors at a level, e.g.,
+   anchors_dframe(issues_html, issues_dframe.url).to_excel(...)"""
+   anchors = [(a_href, base_url, a_text) 
+              for html, base_url in zip(htmls, base_urls)
+              for a_href, a_text in iter_anchors(html, href, string)]
+   return process_hrefs([a[0] for a in anchors], [a[1] for a in anchors],
+                        [a[2] for a in anchors])
 
 #%% 2. Functions for minimally processing HTML files as bytes or strings
 
@@ -192,86 +604,151 @@ def create_mirror_tree(base_path, dirnames):
       print(f"Unable to make directories from {base_path}")
       return None
 
+# Stream raw HTML in chunks to a temporary file beside its final path,
+# computing length and CRC-32 as chunks arrive, then rename the finished file
+# into place (os.replace is atomic). Memory stays flat for large documents,
+# and an interrupted download never leaves a partial file in the mirror.
+def stream_to_file(response, mirror_path, chunk_size = 65536):
+   """Write body of (streamed) requests.Response to temporary file beside
+   mirror_path; return (temporary path, length, CRC-32 as 8 hex digits,
+   SHA-1 as hex digits)."""
+   import hashlib
+   
+   part_path = f'{mirror_path}.{os.getpid()}-{threading.get_ident()}.part'
+   length, crc32, sha1 = 0, 0, hashlib.sha1()
+   try:
+      with open(part_path, 'wb') as file_out:
+         for chunk in response.iter_content(chunk_size):
+            file_out.write(chunk)
+            length += len(chunk)
+            crc32 = zlib.crc32(chunk, crc32)
+            sha1.update(chunk)
+   except BaseException:
+      if os.path.exists(part_path):
+         os.remove(part_path)
+      raise
+   finally:
+      response.close()
+      if getattr(response, 'fetch_record', None) is not None:
+         log_fetch(response.fetch_record, length)
+   return part_path, length, f'{crc32:08x}', sha1.hexdigest()
+
 # retrieve unprocessed HTML and immediately write it to local mirror
-def mirror_raw_html(url, mirror_path, timeout = 1, print_url = True):
-   """Use requests.get to retrieve raw (bytes) version of HTML file
-   and write unprocessed HTML to local mirror."""
+def mirror_raw_html(url, mirror_path, timeout = None, print_url = True,
+                    manifest = None, max_tries = 3, archive = None,
+                    warc = None, dedup = None):
+   """Use fetch_url to retrieve raw (bytes) version of HTML file
+   and write unprocessed HTML to local mirror.
+   
+   The body is streamed to a temporary file (see stream_to_file) and renamed
+   into place only once complete. If archive (see open_mirror_archive) is 
+   given, the file is instead added to that zip archive, named by mirror_path
+   without its leading '/'.
+
+   If manifest (see load_mirror_manifest) has an entry for url and the file
+   is already mirrored, send a conditional request (If-None-Match, 
+   If-Modified-Since) and leave the file alone if the server reports it is 
+   unchanged (304) or if its length and CRC-32 match the entry. The entry is
+   updated with the response's ETag, Last-Modified, length, and CRC-32.
+   
+   Transient failures are retried by fetch_url; only a body cut off while
+   streaming is retried here, up to max_tries times. If the request ultimately fails, or returns
+   an empty document, nothing is written (so an existing file is never 
+   replaced by an empty one) and the size returned is 0.
+
+   If warc (see open_warc) is given, each new or changed file is also
+   recorded there, with the response's status and headers.
+
+   If dedup (see load_content_index) is given, a file whose content is 
+   identical to one already mirrored is flagged as a duplicate there and,
+   on local disk, stored as a hard link to the earlier file."""
    if(print_url):
       # print('.', end = '')
       print(f'Processing URL {url}', end = '')
-   try:
-      b0 = requests.get(url, timeout = timeout).content
-   except:
-      b0 = b''
-   with open(mirror_path, 'bw') as file_out:
-       file_out.write(b0)
-   if(print_url):
-       print('.')
-   return len(b0)
-
-# Decode from raw HTML using the following epmirically derived algorithm
-# based on the <meta> element's charset attribute
-# In this order, search and apply 'utf-8', 'iso-8859-1', 'windows'1252'
-#     If none is present, use 'windows-1252'
-# See https://docs.python.org/3/library/codecs.html#standard-encodings
-# meta_win_reb = re.compile(rb'<meta.*charset="?windows-1252.*>', flags=re.M|re.I)
-def html_to_unicode_b(str_b, try_=False):
-   # compiled regular expressions are cached, making repeated calls efficient
-   meta_utf8_reb = re.compile(rb'<meta.*charset="?utf-8.*>', flags=re.M|re.I)
-   meta_lat1_reb = re.compile(rb'<meta.*charset="?iso-8859-1.*>', flags=re.M|re.I)
-   # simplified (gb2312) and traditional (big5) Chinese
-   meta_zhs_reb = re.compile(rb'<meta.*charset="?gb2312.*>', flags=re.M|re.I)
-   meta_zht_reb = re.compile(rb'<meta.*charset="?big5.*>', flags=re.M|re.I)
-
-   # converts raw HTML (bytes) to Unicode HTML (str)
-   # str_u = UnicodeDammit(str_b, ['utf-8', 'windows-1252']).unicode_markup
-   if meta_utf8_reb.search(str_b):   # 'utf-8'
-      codec = 'utf_8'
-   elif meta_lat1_reb.search(str_b): # 'iso-8859-1'
-      codec = 'latin_1'
-   elif meta_zhs_reb.search(str_b):  # 'gb2312'
-      codec = 'gb2312'
-   elif meta_zht_reb.search(str_b):  # 'big5'
-      codec = 'big5'
-   else:                             # 'windows-1252
-      codec = 'cp1252'
-   if try_:
+   entry = manifest.get(url) if manifest is not None else None
+   if archive is None:
+      part_base, mirrored = mirror_path, os.path.exists(mirror_path)
+   else:
+      arcname = mirror_path.lstrip('/')
+      part_base = join(archive['part_dir'], os.path.basename(mirror_path))
+      member = archive_member(archive, arcname)
+      mirrored = member is not None
+   if not mirrored:
+      entry = None
+   for attempt in range(max_tries):
+      try:
+         # fetch_url has already retried failed requests
+         response = fetch_url(url, timeout = timeout, stream = True,
+                              headers = conditional_headers(entry))
+      except requests.exceptions.RequestException as e:
+         if(print_url):
+            print(f' failed ({classify_fetch(error=e)}).')
+         return 0
+      if response.status_code == 304 and entry is not None:
+         response.close()
+         if(print_url):
+            print(' (not modified).')
+         return (os.path.getsize(mirror_path) if archive is None 
+                 else member.file_size)
+      if not response.ok:
+         response.close()
+         if(print_url):
+            print(f' failed (status {response.status_code}).')
+         return 0
       try:
-         str_u = str_b.decode(encoding=codec, errors='strict')
-      except UnicodeDecodeError as e:
-         print(f'UnicodeDecodeError {e} [{e.start}:{e.end}]\n')
-   str_u = str_b.decode(encoding=codec, errors='backslashreplace')
-   return str_u
-
-# Small utilities to separate sequence of operations on HTML
-# x_b take bytes; x_u take strings (UTF-8)
-# sub(' ?(<|>) ?', r'\1') works in well-formed HTML
-
-# example: minim=r'<pre[ >]'
-def html_reduce_space_u(str_u, minim=None):
-    # compiled regular expressions are cached, making repeated calls efficient
-   # universal newlines, except for '\n'
-   newln_re = re.compile('[\n\x0b\x0c\r\x1c\x1d\x1e\x85\u2028\u2029]', flags=re.M)
-   # everything that matches Unicode '\s' except ' ' and universal newlines
-   space_re = re.compile('[\t\x1f\xa0\u1680\u2000\u2001\u2002\u2003\u2004\u2005'
-      '\u2006\u2007\u2008\u2009\u200a\u202f\u205f\u3000]', flags=re.M)
-   min_sp_re = re.compile('^ +(?=<)|( *$)', flags=re.M) # remove space before < or $
-   mult_sp_re = re.compile(' {2,}')#, flags=re.M) # replace 2+ space with 1
-   end_sp_re = re.compile('(^ *)|( *$)', flags=re.M) # remove space on either end
-   mult_nl_re = re.compile('\n{3,}', flags=re.M) # replace 3+ newline with 2
-
-   # str_u = re.sub(r'\s+', ' ', str_u) # \s includes newlines and other spaces
-   str_u = space_re.sub(' ', str_u)      # replace alt-spaces with ' '
-   str_u = str_u.replace('\r\n', '\n')   # replace '\r\n' with '\n'
-   str_u = newln_re.sub('\n', str_u)     # replace alt-newlines with '\n'
-   # remove some whitespace when <pre> is present, more when it's not
-   if minim and re.search(minim, str_u, flags=re.I):
-      str_u = min_sp_re.sub('', str_u)   # remove space before < or line-end
+         part_path, length, crc32, sha1 = stream_to_file(response, part_base)
+         break
+      except STREAM_ERRORS:
+         if attempt + 1 == max_tries:
+            if(print_url):
+               print(' failed (body cut off).')
+            return 0
+         time.sleep(retry_delay(attempt))
+   unchanged = (entry is not None and entry.get('crc32') == crc32 and
+                entry.get('length') == length)
+   if warc is not None and length > 0 and not unchanged:
+      with open(part_path, 'rb') as file_in:
+         warc_write_response(warc, response, file_in.read())
+   if dedup is not None and length > 0 and (unchanged or archive is not None):
+      content_index_add(dedup, sha1, mirror_path)
+   if length == 0 or unchanged:
+      os.remove(part_path)
+   elif archive is not None:
+      archive_write(archive, part_path, arcname)
+   elif dedup is None:
+      os.replace(part_path, mirror_path)
    else:
-      str_u = mult_sp_re.sub(' ', str_u) # 2+ spaces -> ' '
-      str_u = end_sp_re.sub('', str_u)   # empty line
-   str_u = mult_nl_re.sub('\n\n', str_u) # 3+ newlines -> \n\n
-   return str_u
+      # index and place file under one lock, so a file is linked only to an
+      # original already in place with the content indexed for it
+      with _content_index_lock:
+         original = content_index_add(dedup, sha1, mirror_path)
+         if original is not None and link_file(original, part_path + '.lnk'):
+            os.remove(part_path)
+            os.replace(part_path + '.lnk', mirror_path)
+         else:
+            os.replace(part_path, mirror_path)
+   if length == 0:
+      if(print_url):
+         print(' failed (empty).')
+      return 0
+   if manifest is not None:
+      manifest[url] = manifest_entry(response, length, crc32)
+   if(print_url):
+       print('.')
+   return length
+
+# Decoding raw HTML (html_to_unicode_b, with sniff_charset_b) and reducing
+# space (html_reduce_space_u), along with the other transforms of stage 2 
+# (ent_repair, trim_svg), are defined in html_transforms.py, beside this 
+# script, so that worker processes started by map_docs (section 16) can 
+# import them; functions defined here (in __main__) reach only forked workers
+PYCODE_PATH = (os.path.dirname(os.path.abspath(__file__)) 
+               if '__file__' in globals() else os.getcwd())
+if PYCODE_PATH not in sys.path:
+   sys.path.insert(0, PYCODE_PATH)
+from html_transforms import META_CHARSET_CODECS, META_CHARSET_PREFIX, \
+   meta_charsets_reb, sniff_charset_b, html_to_unicode_b, \
+   html_reduce_space_u, ent_repair, ent_repair_reduce, trim_svg
 
 def read_raw_html(path):
    "Read raw (bytes) local copy of HTML file."
@@ -284,3 +761,1784 @@ def read_uni_html(path):
    with open(path, 'r') as file_in:
       uni_html = file_in.read()
    return uni_html
+
+#%% 3. Functions for mirroring many files concurrently
+
+# Retrieving one file at a time leaves the session waiting on the network;
+# a pool of threads overlaps those waits, while a semaphore for each host
+# bounds the number of simultaneous requests made to any one server
+_host_semaphores = {}
+_host_semaphores_lock = threading.Lock()
+
+def host_semaphore(url, per_host=4):
+   "Return shared semaphore that bounds concurrent requests to host of url."
+   key = (urlparse(url).netloc, per_host)
+   with _host_semaphores_lock:
+      if key not in _host_semaphores:
+         _host_semaphores[key] = threading.BoundedSemaphore(per_host)
+      return _host_semaphores[key]
+
+# One file that fails unexpectedly (any exception not handled within 
+# mirror_raw_html) must not abort a pool of thousands: report it and record
+# size 0, as for any other failure.
+def mirror_raw_html_guarded(url, mirror_path, **kwargs):
+   "Call mirror_raw_html; report any exception and return 0 instead."
+   try:
+      return mirror_raw_html(url, mirror_path, **kwargs)
+   except Exception as e:
+      print(f'\n{url} failed ({type(e).__name__}: {e})')
+      return 0
+
+def mirror_raw_html_pool(urls, mirror_paths, base_path='', max_workers=16,
+                         per_host=4, timeout=None, progress=True, manifest=None,
+                         archive=None, warc=None, dedup=None):
+   """
+   Retrieve many raw HTML files concurrently, writing each to local mirror
+   as soon as it arrives (see mirror_raw_html).
+
+   Parameters
+   urls : iterable of str
+      absolute URLs to retrieve, e.g., *_cc_df.url
+   mirror_paths : iterable of str
+      paths on local mirror, e.g., *_cc_df.mirror_path
+   base_path : str
+      prefix for each mirror path, e.g., MMWR_BASE_PATH_b0
+   max_workers : int
+      number of threads in pool, shared by all hosts
+   per_host : int
+      maximum number of simultaneous requests to any one host
+   timeout : float
+      seconds to wait for each response, passed to mirror_raw_html;
+      None to adapt to each host (see host_timeout)
+   progress : bool
+      whether to show tqdm progress bar as files arrive
+   manifest : dict
+      mirror manifest (see load_mirror_manifest), updated in place
+   archive : dict
+      zip archive to write into (see open_mirror_archive) instead of
+      separate files; base_path is then usually ''
+   warc : dict
+      WARC file in which to record responses as well (see open_warc)
+   dedup : dict
+      content index in which to flag duplicates (see load_content_index)
+
+   Returns
+   list of int
+      size of each file in bytes, in same order as urls (0 if not retrieved)
+   """
+   urls, mirror_paths = list(urls), list(mirror_paths)
+   sizes = [0] * len(urls)
+
+   def mirror_one(j):
+      with host_semaphore(urls[j], per_host):
+         return mirror_raw_html_guarded(urls[j], base_path + mirror_paths[j],
+                                        timeout=timeout, print_url=False,
+                                        manifest=manifest, archive=archive, 
+                                        warc=warc, dedup=dedup)
+
+   with ThreadPoolExecutor(max_workers=max_workers) as pool:
+      futures = {pool.submit(mirror_one, j): j for j in range(len(urls))}
+      for future in tqdm(as_completed(futures), total=len(futures),
+                         disable=not progress):
+         sizes[futures[future]] = future.result()
+   return sizes
+
+def crawl_pipeline(toc_urls, extract_fn, base_path='', toc_workers=4,
+                   article_workers=16, per_host=4, timeout=None, 
+                   progress=True, manifest=None, archive=None, warc=None,
+                   dedup=None):
+   """
+   Retrieve table-of-contents (TOC) pages and mirror the articles they list,
+   overlapping parsing with retrieval: as soon as a TOC page arrives and is
+   parsed, its articles are queued for a pool of download threads, so the
+   first articles land while remaining TOC pages are still in flight.
+
+   Parameters
+   toc_urls : iterable of str
+      absolute URLs of TOC pages, e.g., issues_dframe.url
+   extract_fn : function
+      extract_fn(html, url) -> list of dicts from process_aTag for articles
+      to mirror from one TOC page
+   base_path : str
+      prefix for each article's mirror_path, e.g., EID_BASE_PATH_b0
+   toc_workers, article_workers : int
+      number of threads retrieving TOC pages and articles, respectively
+   per_host, timeout, manifest, archive, warc, dedup
+      as for mirror_raw_html_pool
+
+   Returns
+   tuple (list of str, pandas.DataFrame)
+      HTML of each TOC page, in same order as toc_urls ('' if failed), and
+      articles in TOC order (one row for each mirror_path), with size of
+      each mirrored file (0 if not retrieved)
+
+   Directories for mirror paths must already exist (see create_mirror_tree)
+   unless archive is given.
+   """
+   toc_urls = list(toc_urls)
+   toc_html = [''] * len(toc_urls)
+   articles, downloads = [], {}
+
+   def fetch_toc(url):
+      with host_semaphore(url, per_host):
+         try:
+            return get_html_from_url(url, timeout=timeout)
+         except Exception as e:
+            print(f'\n{url} failed ({type(e).__name__}: {e})')
+            return ''
+
+   def mirror_article(url, mirror_path):
+      with host_semaphore(url, per_host):
+         return mirror_raw_html_guarded(url, base_path + mirror_path, 
+            timeout=timeout, print_url=False, manifest=manifest, 
+            archive=archive, warc=warc, dedup=dedup)
+
+   with ThreadPoolExecutor(max_workers=toc_workers) as toc_pool, \
+        ThreadPoolExecutor(max_workers=article_workers) as article_pool:
+      toc_futures = {toc_pool.submit(fetch_toc, url): j 
+                     for j, url in enumerate(toc_urls)}
+      for future in tqdm(as_completed(toc_futures), total=len(toc_futures),
+                         disable=not progress):
+         j = toc_futures[future]
+         toc_html[j] = future.result()
+         if not toc_html[j]:
+            continue
+         for seq, record in enumerate(extract_fn(toc_html[j], toc_urls[j])):
+            if record['mirror_path'] in downloads:
+               continue
+            downloads[record['mirror_path']] = article_pool.submit(
+               mirror_article, record['url'], record['mirror_path'])
+            articles.append(dict(record, toc=j, seq=seq))
+      sizes = {path: future.result() for path, future 
+               in tqdm(downloads.items(), disable=not progress)}
+
+   articles_dframe = pd.DataFrame(articles, columns=[
+      'base', 'href', 'url', 'path', 'filename', 'mirror_path', 'string', 
+      'toc', 'seq'])
+   articles_dframe = articles_dframe.sort_values(['toc', 'seq'])\
+      .drop(columns=['toc', 'seq']).reset_index(drop=True)
+   articles_dframe['size'] = articles_dframe['mirror_path'].map(sizes)
+   return toc_html, articles_dframe
+
+# Mirroring the journals one after another takes the sum of their times,
+# though MMWR and PCD (www.cdc.gov) and EID (wwwnc.cdc.gov) are served
+# separately. mirror_journals runs them together in one pool of threads.
+# Each journal has its own budget of simultaneous requests to each host; 
+# a file is handed to the pool only when its budget has room, so no thread
+# sits waiting on a busy host while another host is idle.
+def mirror_journals(jobs, max_workers=32, per_host=4, timeout=None, 
+                    progress=True):
+   """
+   Mirror several journals concurrently, in one shared pool of threads.
+
+   Parameters
+   jobs : dict
+      {journal: dict(urls=..., mirror_paths=..., base_path=..., 
+                     manifest=..., archive=..., warc=..., dedup=...,
+                     per_host=...)},
+      where urls and mirror_paths are required and the rest are optional,
+      as for mirror_raw_html_pool (per_host defaults to argument below)
+   max_workers : int
+      number of threads in pool, shared by all journals
+   per_host : int
+      default maximum number of simultaneous requests by each journal to
+      any one host
+   timeout, progress
+      as for mirror_raw_html_pool
+
+   Returns
+   tuple (dict, pandas.DataFrame)
+      {journal: list of sizes, as from mirror_raw_html_pool}, and summary
+      with one row for each journal and one for all: files, failed, bytes,
+      secs (until journal's last file), files_per_sec
+
+   Requests to each host are also paced by that host's token bucket (see
+   host_acquire), which MMWR and PCD share.
+   """
+   sizes, finished, queues = dict(), dict(), dict()
+   for journal, job in jobs.items():
+      job['urls'], job['mirror_paths'] = \
+         list(job['urls']), list(job['mirror_paths'])
+      sizes[journal] = [0] * len(job['urls'])
+      for j, url in enumerate(job['urls']):
+         queues.setdefault((journal, urlparse(url).netloc), deque())\
+            .append(j)
+   in_flight = {key: 0 for key in queues}
+   completed = {journal: 0 for journal in jobs}
+   futures = dict()
+   start = time.monotonic()
+
+   def mirror_one(journal, j):
+      job = jobs[journal]
+      return mirror_raw_html_guarded(
+         job['urls'][j], job.get('base_path', '') + job['mirror_paths'][j],
+         timeout=timeout, print_url=False, manifest=job.get('manifest'),
+         archive=job.get('archive'), warc=job.get('warc'), 
+         dedup=job.get('dedup'))
+
+   def dispatch(pool):
+      # take turns among journals and hosts, up to each budget
+      for (journal, host), queue in queues.items():
+         budget = jobs[journal].get('per_host', per_host)
+         while (queue and in_flight[(journal, host)] < budget and 
+                len(futures) < max_workers):
+            j = queue.popleft()
+            futures[pool.submit(mirror_one, journal, j)] = (journal, host, j)
+            in_flight[(journal, host)] += 1
+
+   with ThreadPoolExecutor(max_workers=max_workers) as pool, \
+        tqdm(total=sum(len(x) for x in sizes.values()), 
+             disable=not progress) as bar:
+      dispatch(pool)
+      while futures:
+         done, _ = wait(futures, return_when=FIRST_COMPLETED)
+         for future in done:
+            journal, host, j = futures.pop(future)
+            in_flight[(journal, host)] -= 1
+            sizes[journal][j] = future.result()
+            finished[journal] = time.monotonic() - start
+            completed[journal] += 1
+         bar.update(len(done))
+         bar.set_postfix(completed, refresh=False)
+         dispatch(pool)
+
+   summary = pd.DataFrame([dict(journal=journal, files=len(x),
+      failed=sum([size==0 for size in x]), bytes=sum(x), 
+      secs=finished.get(journal, 0.0)) for journal, x in sizes.items()])
+   summary = pd.concat([summary, pd.DataFrame([dict(journal='all',
+      files=summary.files.sum(), failed=summary.failed.sum(),
+      bytes=summary.bytes.sum(), secs=time.monotonic() - start)])],
+      ignore_index=True)
+   summary['files_per_sec'] = summary.files / summary.secs.where(
+      summary.secs > 0)
+   return sizes, summary
+
+#%% 4. Functions for keeping a manifest of mirrored files
+
+# A manifest records, for each URL, what was last retrieved: validators from
+# the server (ETag, Last-Modified) and the length and CRC-32 of the raw HTML.
+# With a manifest, a yearly refresh sends conditional requests and rewrites
+# only new or changed files. It is stored as JSON keyed by URL:
+#    {url: {'etag': ..., 'last_modified': ..., 'length': ..., 'crc32': ...}}
+
+def load_mirror_manifest(path):
+   "Read mirror manifest from JSON file; return empty manifest if none exists."
+   if not os.path.exists(path):
+      return dict()
+   with open(path, 'r', encoding='utf-8') as file_in:
+      return json.load(file_in)
+
+def save_mirror_manifest(manifest, path):
+   "Write mirror manifest to JSON file, replacing any previous version whole."
+   with open(path + '.tmp', 'w', encoding='utf-8') as file_out:
+      json.dump(manifest, file_out, indent=1, sort_keys=True)
+   os.replace(path + '.tmp', path)
+
+def manifest_entry(response, length, crc32):
+   "Construct manifest entry from requests.Response and raw HTML properties."
+   return dict(etag=response.headers.get('ETag'),
+               last_modified=response.headers.get('Last-Modified'),
+               length=length, crc32=crc32)
+
+def conditional_headers(entry):
+   "Construct headers for a conditional GET from a manifest entry (or None)."
+   headers = dict()
+   if entry is None:
+      return headers
+   if entry.get('etag'):
+      headers['If-None-Match'] = entry['etag']
+   if entry.get('last_modified'):
+      headers['If-Modified-Since'] = entry['last_modified']
+   return headers
+
+def seed_mirror_manifest(cc_df, mirror_list_csv, manifest=None):
+   """
+   Seed mirror manifest from a mirror list such as 
+   csv-output/cdc_mirror_list_1982-2024.csv, matching its Name column to 
+   mirror_path in *_cc_df to recover each file's URL.
+
+   Parameters
+   cc_df : pandas.DataFrame
+      journal-specific DataFrame with url and mirror_path columns
+   mirror_list_csv : str
+      path to CSV file with Length, Date    Time, CRC-32, and Name columns
+   manifest : dict
+      existing manifest to update; entries already present are kept
+
+   Returns
+   dict
+      manifest keyed by URL
+
+   The zip archives record when each file was written, not the server's
+   Last-Modified; that time, set back 1 day to allow for time zones, serves
+   as If-Modified-Since until a response provides real validators.
+   """
+   from datetime import timezone
+   from email.utils import format_datetime
+   
+   manifest = dict() if manifest is None else manifest
+   mirror_list = pd.read_csv(mirror_list_csv, dtype={'CRC-32': str})
+   mirror_list['mirror_path'] = '/' + mirror_list['Name']
+   seeds = cc_df.assign(
+      mirror_path=cc_df['mirror_path'].str.replace('\\', '/', regex=False))\
+      .merge(mirror_list, on='mirror_path', how='inner')\
+      .drop_duplicates('url', keep='last')
+   written = pd.to_datetime(seeds['Date    Time']) - pd.Timedelta(days=1)
+   for url, length, crc32, when in zip(
+         seeds['url'], seeds['Length'], seeds['CRC-32'], written):
+      when = when.to_pydatetime().replace(tzinfo=timezone.utc)
+      manifest.setdefault(url, dict(
+         etag=None, last_modified=format_datetime(when, usegmt=True),
+         length=int(length), crc32=crc32.zfill(8)))
+   return manifest
+
+def find_mirror_gaps(cc_df, mirror_list_csv, base_path=None):
+   """
+   Find files in *_cc_df that are missing from a mirror list such as
+   csv-output/cdc_mirror_list_1982-2024.csv or, if base_path is given, whose
+   local copy differs in size from the list, as candidates for backfilling.
+
+   Parameters
+   cc_df : pandas.DataFrame
+      journal-specific DataFrame with url and mirror_path columns
+   mirror_list_csv : str
+      path to CSV file with Length and Name columns
+   base_path : str
+      root of local mirror tree, to which mirror_path is appended
+
+   Returns
+   pandas.DataFrame
+      rows of cc_df (1 per mirror_path) with Length (listed size, or 0) and
+      gap ('missing' or 'size') columns, e.g., for mirror_raw_html_pool
+   """
+   mirror_list = pd.read_csv(mirror_list_csv, usecols=['Length', 'Name'])
+   listed = dict(zip('/' + mirror_list['Name'], mirror_list['Length']))
+   cc_df = cc_df.drop_duplicates('mirror_path', keep='last')
+   paths = cc_df['mirror_path'].str.replace('\\', '/', regex=False)
+   missing = set(paths) - listed.keys()
+   gaps = ['missing' if path in missing else None for path in paths]
+   if base_path is not None:
+      for i, (path, mirror_path) in enumerate(zip(paths, cc_df['mirror_path'])):
+         if gaps[i] is not None:
+            continue
+         try:
+            size = os.stat(base_path + mirror_path).st_size
+         except OSError:
+            continue
+         if size != listed[path]:
+            gaps[i] = 'size'
+   return cc_df.assign(Length=[listed.get(path, 0) for path in paths],
+                       gap=gaps)\
+      .dropna(subset=['gap'])
+
+#%% 5. Functions for a resumable crawl frontier
+
+# Discovery walks home -> series -> volume -> issue -> article, and each level
+# depends on HTML retrieved at the level above. A crawl frontier in SQLite
+# records, for each level, the anchors discovered (as *_dframe) and each page
+# retrieved (with its HTML), committing as it goes. If a run dies, re-running
+# the same cells resumes where it stopped and never re-requests pages that
+# were already retrieved.
+#    anchors: level, seq, base, href, url, path, filename, mirror_path, string
+#    pages:   level, url, state ('done' or 'failed'), html, fetched_at
+
+def open_crawl_frontier(db_path):
+   "Open (or create) SQLite crawl frontier; return connection."
+   con = sqlite3.connect(db_path, check_same_thread=False)
+   con.execute("""CREATE TABLE IF NOT EXISTS anchors (
+      level TEXT, seq INTEGER, base TEXT, href TEXT, url TEXT, path TEXT,
+      filename TEXT, mirror_path TEXT, string TEXT, PRIMARY KEY (level, seq))""")
+   con.execute("""CREATE TABLE IF NOT EXISTS pages (
+      level TEXT, url TEXT, state TEXT, html TEXT, fetched_at TEXT, 
+      PRIMARY KEY (level, url))""")
+   con.commit()
+   return con
+
+def frontier_save(con, level, dframe):
+   """Record anchors discovered at level (replacing any recorded before);
+   return dframe unchanged so that it can wrap an assignment."""
+   columns = ['base', 'href', 'url', 'path', 'filename', 'mirror_path', 'string']
+   with con:
+      con.execute('DELETE FROM anchors WHERE level = ?', (level,))
+      con.executemany(
+         'INSERT INTO anchors VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+         [(level, seq, *row) for seq, row 
+          in enumerate(dframe[columns].itertuples(index=False, name=None))])
+   return dframe
+
+def frontier_load(con, level):
+   "Retrieve anchors recorded at level as DataFrame (empty if none)."
+   return pd.read_sql_query(
+      """SELECT base, href, url, path, filename, mirror_path, string 
+         FROM anchors WHERE level = ? ORDER BY seq""", con, params=(level,))
+
+def frontier_fetch(con, level, urls, timeout=None, max_workers=4, per_host=4,
+                   progress=True):
+   """
+   Retrieve HTML for each URL at level that has not already been retrieved,
+   recording each page as it arrives.
+
+   Parameters
+   con : sqlite3.Connection
+      crawl frontier from open_crawl_frontier
+   level : str
+      level in hierarchy, e.g., 'series', 'volume', 'issue'
+   urls : iterable of str
+      absolute URLs of pages at level, e.g., volumes_dframe.url
+   timeout : float
+      seconds to wait for each response, passed to get_html_from_url;
+      None to adapt to each host (see host_timeout)
+   max_workers, per_host : int
+      number of threads, and maximum simultaneous requests to any one host
+
+   Returns
+   list of str
+      HTML for each URL, in same order as urls ('' if retrieval failed;
+      failed pages are retried the next time frontier_fetch is called)
+   """
+   from datetime import datetime, timezone
+   
+   urls = list(urls)
+   done = dict(con.execute(
+      "SELECT url, html FROM pages WHERE level = ? AND state = 'done'", 
+      (level,)).fetchall())
+   pending = sorted(set(url for url in urls if url not in done))
+
+   def fetch_one(url):
+      with host_semaphore(url, per_host):
+         return get_html_from_url(url, timeout=timeout)
+
+   with ThreadPoolExecutor(max_workers=max_workers) as pool:
+      futures = {pool.submit(fetch_one, url): url for url in pending}
+      for future in tqdm(as_completed(futures), total=len(futures),
+                         disable=not progress):
+         url, html = futures[future], future.result()
+         with con:
+            con.execute('INSERT OR REPLACE INTO pages VALUES (?, ?, ?, ?, ?)',
+               (level, url, 'done' if html else 'failed', html,
+                datetime.now(timezone.utc).isoformat(timespec='seconds')))
+         if html:
+            done[url] = html
+   return [done.get(url, '') for url in urls]
+
+#%% 6. Functions for mirroring directly into zip archives
+
+# Tens of thousands of small files are slow to create, copy, and scan on
+# shared filesystems. Instead, each retrieved document can be appended to a
+# single zip archive for each series (as distributed in html-mirrors/),
+# named by its mirror_path, e.g., 'pcd/issues/2024/24_0082.htm'. Threads
+# share one archive, so additions are serialized with a lock. A document
+# that changed since an earlier run is appended again under the same name;
+# zipfile warns of the duplicate, and reading the name yields the latest.
+# The central directory (the index of members) is written only when the
+# archive is closed, so it is checkpointed every so many members: the 
+# archive is closed and reopened, and a copy of its directory is kept 
+# beside it (zip_path + '.dir'). Appending overwrites the directory in the
+# archive itself, so after a crash the archive has none; it is then not
+# reopened (which would start a new, empty archive) until it is restored 
+# from the copy (see recover_mirror_archive).
+
+def open_mirror_archive(zip_path, compresslevel=9, checkpoint=200):
+   """Open (or create) zip archive for mirroring, in append mode; return dict
+   with ZipFile, lock, and directory for temporary files. Its directory is 
+   written every checkpoint members. Raise BadZipFile if an existing archive
+   has no valid directory."""
+   zip_path = normpath(expanduser(zip_path))
+   if os.path.exists(zip_path) and os.path.getsize(zip_path) > 0:
+      try:
+         zipfile.ZipFile(zip_path).close()
+      except zipfile.BadZipFile:
+         raise zipfile.BadZipFile(
+            f'{zip_path} has no valid central directory (interrupted run?); '
+            'restore it with recover_mirror_archive') from None
+   archive = dict(
+      zip=zipfile.ZipFile(zip_path, 'a', compression=zipfile.ZIP_DEFLATED,
+                          compresslevel=compresslevel),
+      lock=threading.Lock(), path=zip_path, compresslevel=compresslevel,
+      checkpoint=checkpoint, pending=0,
+      part_dir=os.path.dirname(zip_path) or '.')
+   checkpoint_mirror_archive(archive)
+   return archive
+
+def checkpoint_mirror_archive(archive):
+   """Write central directory of mirror archive (by closing and reopening 
+   it), and keep a copy of it for recover_mirror_archive."""
+   with archive['lock']:
+      archive['zip'].close()
+      with open(archive['path'], 'rb') as file_in:
+         with zipfile.ZipFile(file_in) as zip_in:
+            file_in.seek(zip_in.start_dir)
+         directory = f'{zip_in.start_dir}\n'.encode() + file_in.read()
+      with open(archive['path'] + '.dir.tmp', 'wb') as file_out:
+         file_out.write(directory)
+      os.replace(archive['path'] + '.dir.tmp', archive['path'] + '.dir')
+      archive['zip'] = zipfile.ZipFile(archive['path'], 'a', 
+         compression=zipfile.ZIP_DEFLATED, 
+         compresslevel=archive['compresslevel'])
+      archive['pending'] = 0
+
+def recover_mirror_archive(zip_path):
+   """Restore central directory of mirror archive from its last checkpoint,
+   dropping members added since; return number of members."""
+   zip_path = normpath(expanduser(zip_path))
+   with open(zip_path + '.dir', 'rb') as file_in:
+      start_dir = int(file_in.readline())
+      directory = file_in.read()
+   with open(zip_path, 'r+b') as file_out:
+      file_out.truncate(start_dir)
+      file_out.seek(start_dir)
+      file_out.write(directory)
+   with zipfile.ZipFile(zip_path) as zip_in:
+      return len(zip_in.NameToInfo)
+
+def close_mirror_archive(archive):
+   "Close mirror archive, writing its central directory."
+   with archive['lock']:
+      archive['zip'].close()
+   if os.path.exists(archive['path'] + '.dir'):
+      os.remove(archive['path'] + '.dir')
+
+def archive_member(archive, arcname):
+   "Return ZipInfo for arcname in mirror archive, or None if absent."
+   with archive['lock']:
+      return archive['zip'].NameToInfo.get(arcname)
+
+# zipfile does not record the compression level, which unzip -v reports 
+# from general-purpose flag bits 1-2 (as set by Info-ZIP zip)
+def deflate_flag_bits(compresslevel):
+   "Return general-purpose flag bits for deflate compression level."
+   # bits 1-2: 0 normal (Defl:N), 1 maximum (X), 2 fast (F), 3 superfast (S)
+   if compresslevel is None:
+      return 0
+   if compresslevel >= 8:
+      return 1 << 1
+   return {1: 3 << 1, 2: 2 << 1}.get(compresslevel, 0)
+
+def archive_write(archive, part_path, arcname):
+   "Add finished temporary file to mirror archive as arcname, then remove it."
+   try:
+      with archive['lock']:
+         zip_out = archive['zip']
+         zip_out.write(part_path, arcname)
+         # record compression level in local header and central directory
+         info = zip_out.NameToInfo[arcname]
+         info.flag_bits |= deflate_flag_bits(archive['compresslevel'])
+         zip_out.fp.seek(info.header_offset + 6)
+         zip_out.fp.write(info.flag_bits.to_bytes(2, 'little'))
+         zip_out.fp.seek(zip_out.start_dir)
+         archive['pending'] += 1
+         checkpoint = archive['pending'] >= archive['checkpoint']
+   finally:
+      os.remove(part_path)
+   if checkpoint:
+      checkpoint_mirror_archive(archive)
+
+def mirror_archive_list(zip_path, series):
+   """
+   List contents of a mirror archive in the form of cdc_mirror_list_*.csv 
+   (as from `unzip -v`), omitting directories.
+
+   Parameters
+   zip_path : str
+      path to zip archive
+   series : str
+      value for Series column, e.g., 'mmwr'
+
+   Returns
+   pandas.DataFrame
+      Series, Length, Method, Size, Cmpr, Date    Time, CRC-32, Name
+   """
+   # compression options in general-purpose flag bits 1-2, as shown by unzip
+   deflate_opts = {0: 'Defl:N', 1: 'Defl:X', 2: 'Defl:F', 3: 'Defl:S'}
+   # only latest member of each name (members replaced on later runs remain
+   # in the archive, but are no longer read)
+   with zipfile.ZipFile(normpath(expanduser(zip_path))) as zip_in:
+      infos = [info for info in zip_in.NameToInfo.values() 
+               if not info.is_dir()]
+   return pd.DataFrame([{
+      'Series': series,
+      'Length': info.file_size,
+      'Method': (deflate_opts[(info.flag_bits >> 1) & 3] 
+                 if info.compress_type == zipfile.ZIP_DEFLATED else 'Stored'),
+      'Size': info.compress_size,
+      'Cmpr': (f'{round(100 * (1 - info.compress_size / info.file_size))}%'
+               if info.file_size else '0%'),
+      'Date    Time': '{:04d}-{:02d}-{:02d} {:02d}:{:02d}'.format(
+         *info.date_time[:5]),
+      'CRC-32': f'{info.CRC:08x}',
+      'Name': info.filename} for info in infos])
+
+# Stage 2 can read documents straight from the zipped mirror archives, 
+# without first extracting tens of thousands of files to disk. Members are
+# read by name through each archive's central directory, in the order given
+# (e.g., *_cc_df.mirror_path), one at a time.
+def iter_zip_html(zip_paths, mirror_paths):
+   """
+   Generate raw HTML documents from zipped mirror archives.
+
+   Parameters
+   zip_paths : str or list of str
+      zip archives, e.g., ['html-mirrors/pcd_2004-2023.zip',
+      'html-mirrors/pcd_2024.zip']; a name in several archives is read from
+      the last, so later archives supersede earlier ones
+   mirror_paths : iterable of str
+      paths on local mirror, e.g., *_cc_df.mirror_path, named in archives
+      without leading '/'
+
+   Yields
+   tuple (str, bytes)
+      mirror_path and raw (bytes) HTML, in same order as mirror_paths; 
+      paths not in any archive are skipped (and counted at end)
+   """
+   zip_paths = [zip_paths] if isinstance(zip_paths, str) else zip_paths
+   zips, where, missing = [], dict(), 0
+   try:
+      for zip_path in zip_paths:
+         zips.append(zipfile.ZipFile(normpath(expanduser(zip_path))))
+         where.update({name: zips[-1] for name in zips[-1].NameToInfo})
+      for mirror_path in mirror_paths:
+         arcname = mirror_path.replace('\\', '/').lstrip('/')
+         if arcname not in where:
+            missing += 1
+            continue
+         yield mirror_path, where[arcname].read(arcname)
+   finally:
+      for zip_in in zips:
+         zip_in.close()
+      if missing:
+         print(f'{missing} mirror paths not found in archives')
+
+#%% 7. Functions for recording and replaying HTTP responses
+
+# To benchmark and regression-test the crawl without requesting anything
+# from cdc.gov, responses can be recorded to a local store (SQLite, keyed by
+# URL) and then served by a local replay server, with added latency and
+# injected failures. While replaying, fetch_url sends each request to the 
+# replay server, with the original host as first path segment, e.g.,
+#    https://www.cdc.gov/pcd/index.htm -> http://127.0.0.1:8000/www.cdc.gov/pcd/index.htm
+# Rate limits and timeouts still apply to the original host.
+#    responses: url, status, headers (JSON), body, recorded_at
+
+_http_record = dict(store=None, lock=threading.Lock())
+_http_replay = dict(base=None)
+
+def open_http_store(store_path):
+   "Open (or create) SQLite store of recorded HTTP responses."
+   con = sqlite3.connect(store_path, check_same_thread=False)
+   con.execute("""CREATE TABLE IF NOT EXISTS responses (
+      url TEXT PRIMARY KEY, status INTEGER, headers TEXT, body BLOB, 
+      recorded_at TEXT)""")
+   con.commit()
+   return con
+
+def store_http_response(con, url, status, headers, body):
+   "Add (or replace) one response in store of recorded HTTP responses."
+   from datetime import datetime, timezone
+   
+   # bodies are stored decoded, so drop headers that describe the transfer
+   headers = {key: val for key, val in headers.items() if key.lower() 
+              not in ('content-encoding', 'content-length', 'transfer-encoding',
+                      'connection', 'keep-alive')}
+   with con:
+      con.execute('INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?)',
+         (url, status, json.dumps(headers), body,
+          datetime.now(timezone.utc).isoformat(timespec='seconds')))
+
+def record_http_responses(store_path=None):
+   """Record every response that fetch_url returns (and any redirects that 
+   led to it) in store at store_path; store_path=None stops recording.
+   While recording, bodies are read in full even if streamed."""
+   with _http_record['lock']:
+      if _http_record['store'] is not None:
+         _http_record['store'].close()
+      _http_record['store'] = (None if store_path is None 
+                               else open_http_store(store_path))
+
+def record_http_response(response):
+   """Record requests.Response (and its redirect history) in recording store.
+   Only 2xx and 3xx responses to unconditional requests are recorded, so that
+   a 304 (e.g., refreshing a manifest) or a failure after all retries never 
+   replaces a good response already stored."""
+   with _http_record['lock']:
+      con = _http_record['store']
+      if con is None:
+         return
+      for resp in response.history + [response]:
+         conditional = any(key in resp.request.headers 
+                           for key in ('If-None-Match', 'If-Modified-Since'))
+         if (200 <= resp.status_code < 400 and resp.status_code != 304 and 
+             not conditional):
+            store_http_response(con, original_url(resp.url), 
+                                resp.status_code, resp.headers, resp.content)
+
+def seed_http_store(con, zip_path):
+   """Add each HTML file in a mirror archive (e.g., html-mirrors/pcd_2024.zip)
+   to store as a 200 response; return number of files added. EID files are 
+   served from wwwnc.cdc.gov, MMWR and PCD files from www.cdc.gov."""
+   n = 0
+   with zipfile.ZipFile(normpath(expanduser(zip_path))) as zip_in:
+      for info in zip_in.NameToInfo.values():
+         if info.is_dir():
+            continue
+         host = 'wwwnc.cdc.gov' if info.filename.startswith('eid/') \
+            else 'www.cdc.gov'
+         store_http_response(con, f'https://{host}/{info.filename}', 200,
+            {'Content-Type': 'text/html'}, zip_in.read(info))
+         n += 1
+   return n
+
+def replay_http(base=None):
+   """Send requests made by fetch_url to replay server at base (e.g., 
+   'http://127.0.0.1:8000'); base=None resumes requests to original hosts."""
+   _http_replay['base'] = None if base is None else base.rstrip('/')
+
+def replay_url(url):
+   "Map URL to replay server while replaying; otherwise return it unchanged."
+   base = _http_replay['base']
+   if base is None:
+      return url
+   parsed = urlparse(url)
+   return f'{base}/{parsed.netloc}{parsed.path}' + \
+      (f'?{parsed.query}' if parsed.query else '')
+
+def original_url(url):
+   "Map URL from replay server back to original URL; inverse of replay_url."
+   base = _http_replay['base']
+   if base is None or not url.startswith(base + '/'):
+      return url
+   return 'https://' + url[len(base) + 1:]
+
+def start_replay_server(store_path, port=8000, latency=0, error_rate=0, 
+                        reset_rate=0, seed=None):
+   """
+   Serve recorded HTTP responses from store on localhost, in a background
+   thread, and direct fetch_url to it (see replay_http).
+
+   Parameters
+   store_path : str
+      path to SQLite store (see open_http_store)
+   port : int
+      port on 127.0.0.1 on which to listen
+   latency : float or tuple
+      seconds to delay each response, or (min, max) for a uniform delay
+   error_rate : float
+      fraction of requests answered with 503 Service Unavailable
+   reset_rate : float
+      fraction of requests whose connection is dropped without a response
+   seed : int
+      seed for random delays and failures, for reproducible runs
+
+   Returns
+   http.server.ThreadingHTTPServer
+      call .shutdown() and replay_http(None) to stop replaying
+   
+   Paths not in store are also looked up as mirror paths (adding index.html
+   or .html, as process_aTag does), since seeded stores are keyed that way.
+   """
+   from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+   
+   con = open_http_store(store_path)
+   con_lock = threading.Lock()
+   rng = random.Random(seed)
+   rng_lock = threading.Lock()
+
+   def lookup(url):
+      candidates = [url, url + 'index.html' if url.endswith('/') 
+                    else url + '.html']
+      with con_lock:
+         for candidate in candidates:
+            row = con.execute('SELECT status, headers, body FROM responses '
+                              'WHERE url = ?', (candidate,)).fetchone()
+            if row is not None:
+               return row
+      return None
+
+   class ReplayHandler(BaseHTTPRequestHandler):
+      protocol_version = 'HTTP/1.1'
+
+      def log_message(self, format, *args):
+         pass
+
+      def do_GET(self):
+         with rng_lock:
+            delay = (rng.uniform(*latency) if isinstance(latency, tuple) 
+                     else latency)
+            draw = rng.random()
+         time.sleep(delay)
+         if draw < reset_rate:
+            self.close_connection = True
+            self.connection.close()
+            return
+         if draw < reset_rate + error_rate:
+            row = (503, '{"Retry-After": "0"}', b'')
+         else:
+            row = lookup('https://' + self.path.lstrip('/'))
+         if row is None:
+            row = (404, '{}', b'')
+         status, headers, body = row
+         self.send_response(status)
+         for key, val in json.loads(headers).items():
+            if key.lower() == 'location':
+               val = replay_url(urljoin('https://' + self.path.lstrip('/'), val))
+            self.send_header(key, val)
+         self.send_header('Content-Length', str(len(body)))
+         self.end_headers()
+         self.wfile.write(body)
+
+   server = ThreadingHTTPServer(('127.0.0.1', port), ReplayHandler)
+   server.daemon_threads = True
+   threading.Thread(target=server.serve_forever, daemon=True).start()
+   replay_http(f'http://127.0.0.1:{port}')
+   return server
+
+#%% 8. Functions for logging fetch telemetry
+
+# Timings otherwise survive only as tqdm output copied into comments. With a
+# fetch log open, fetch_url appends one row for every URL requested: status
+# and outcome (see classify_fetch), bytes received, time to first byte (until
+# headers of final response), total time (including waits for the host's
+# token bucket, retries, and, for streamed responses, reading the body),
+# retries, and redirects followed.
+# Rows are appended to CSV as they happen, so a log survives interruption and
+# can be examined (or converted, e.g., to Parquet) during a long crawl.
+FETCH_LOG_COLUMNS = ['time', 'url', 'host', 'status', 'outcome', 'bytes', 
+                     'ttfb', 'total', 'retries', 'redirects']
+_fetch_log = dict(writer=None, file=None, lock=threading.Lock())
+
+def log_fetches(log_path=None):
+   "Start appending fetch telemetry to CSV file at log_path; stop if None."
+   with _fetch_log['lock']:
+      if _fetch_log['file'] is not None:
+         _fetch_log['file'].close()
+      _fetch_log['file'], _fetch_log['writer'] = None, None
+      if log_path is not None:
+         new_log = not os.path.exists(log_path) or os.path.getsize(log_path) == 0
+         _fetch_log['file'] = open(log_path, 'a', newline='', encoding='utf-8', 
+                                   buffering=1)
+         _fetch_log['writer'] = csv.writer(_fetch_log['file'])
+         if new_log:
+            _fetch_log['writer'].writerow(FETCH_LOG_COLUMNS)
+
+def fetch_record(url, start, attempt, response=None, outcome=None):
+   "Construct fetch log record for url, first requested at start (monotonic)."
+   from datetime import datetime, timezone
+   
+   return dict(
+      time=datetime.now(timezone.utc).isoformat(timespec='milliseconds'),
+      url=url, host=urlparse(url).netloc,
+      status=None if response is None else response.status_code,
+      outcome=outcome, bytes=None,
+      ttfb=None if response is None else response.elapsed.total_seconds(),
+      start=start, retries=attempt,
+      redirects=0 if response is None else len(response.history))
+
+def log_fetch(record, length=0):
+   "Append fetch record, with bytes received, to open fetch log (if any)."
+   record = dict(record, bytes=length,
+                 total=round(time.monotonic() - record['start'], 4))
+   with _fetch_log['lock']:
+      if _fetch_log['writer'] is not None:
+         _fetch_log['writer'].writerow(
+            [record[column] for column in FETCH_LOG_COLUMNS])
+
+def read_fetch_log(log_path):
+   """Read fetch log from CSV file into a DataFrame, with year taken from URL
+   path where it has one, e.g., /pcd/issues/2024/ or /mmwr/ind2016_su.html."""
+   fetch_log = pd.read_csv(log_path, parse_dates=['time'], 
+                           dtype={'status': 'Int64'})
+   fetch_log['year'] = fetch_log['url'].str.extract(
+      r'/\D*((?:19|20)\d\d)(?!\d)', expand=False)
+   return fetch_log
+
+def summarize_fetch_log(fetch_log, by=('host', 'year')):
+   """
+   Summarize fetch log by groups, with tail latencies and signs of throttling.
+
+   Parameters
+   fetch_log : pandas.DataFrame
+      from read_fetch_log
+   by : sequence of str
+      columns by which to group, e.g., ['host'] or ['host', 'year']
+
+   Returns
+   pandas.DataFrame
+      for each group: n (requests), failed (outcome not 'ok'), throttled 
+      (status 429 or 503), retries, redirects, MiB; quantiles (50th, 90th, 
+      99th) and maximum of total seconds; quantiles of time to first byte
+   """
+   fetch_log = fetch_log.assign(
+      failed=fetch_log['outcome'] != 'ok',
+      throttled=fetch_log['status'].isin([429, 503]),
+      MiB=fetch_log['bytes'] / 2**20)
+   groups = fetch_log.groupby(list(by), dropna=False)
+   summary = groups.agg(
+      n=('url', 'size'), failed=('failed', 'sum'), 
+      throttled=('throttled', 'sum'), retries=('retries', 'sum'),
+      redirects=('redirects', 'sum'), MiB=('MiB', 'sum'),
+      total_max=('total', 'max'))
+   for q in [0.5, 0.9, 0.99]:
+      summary[f'total_p{round(q * 100)}'] = groups['total'].quantile(q)
+      summary[f'ttfb_p{round(q * 100)}'] = groups['ttfb'].quantile(q)
+   return summary.reset_index()
+
+#%% 9. Functions for writing WARC archives with a CDX index
+
+# Mirrors keep raw HTML bodies only; a WARC (Web ARChive, ISO 28500) file
+# also keeps each response's status, headers, and time of retrieval, in a
+# format that standard replay tools (e.g., pywb) read. Each record is its own
+# gzip member, so a record can be read back with one seek given its offset
+# and length, which the sorted CDX index records for each URL:
+#    urlkey timestamp original mimetype status digest redirect meta 
+#    length offset filename
+
+def open_warc(warc_path):
+   "Open WARC file (*.warc.gz) for appending response records."
+   warc = dict(path=warc_path, file=open(warc_path, 'ab'), lock=threading.Lock(),
+               cdx=[])
+   if warc['file'].tell() == 0:
+      info = b'software: harvest-cdc-journals\r\nformat: WARC File Format 1.1\r\n'
+      warc_append(warc, 'warcinfo', None, 'application/warc-fields', info,
+                  {'WARC-Filename': os.path.basename(warc_path)})
+   return warc
+
+def warc_append(warc, warc_type, url, content_type, block, fields=None):
+   """Append one record as a gzip member; return its offset and length in
+   file and its WARC-Date."""
+   import gzip
+   import uuid
+   from datetime import datetime, timezone
+   
+   headers = {'WARC-Type': warc_type,
+      'WARC-Record-ID': f'<urn:uuid:{uuid.uuid4()}>',
+      'WARC-Date': datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')}
+   if url is not None:
+      headers['WARC-Target-URI'] = url
+   headers.update(fields or {})
+   headers.update({'Content-Type': content_type, 
+                   'Content-Length': str(len(block))})
+   record = ('WARC/1.1\r\n' + ''.join(f'{key}: {val}\r\n' 
+      for key, val in headers.items()) + '\r\n').encode('utf-8') + \
+      block + b'\r\n\r\n'
+   member = gzip.compress(record)
+   with warc['lock']:
+      offset = warc['file'].tell()
+      warc['file'].write(member)
+   return offset, len(member), headers['WARC-Date']
+
+def warc_digest(data):
+   "Digest of bytes as used in WARC and CDX: SHA-1, base-32 encoded."
+   import base64
+   import hashlib
+   return 'sha1:' + base64.b32encode(hashlib.sha1(data).digest()).decode()
+
+def surt_key(url):
+   """Sort-friendly URL key for CDX, e.g.,
+   https://www.cdc.gov/pcd/index.htm -> gov,cdc)/pcd/index.htm"""
+   parsed = urlparse(url)
+   host = re.sub(r'^www\d*\.', '', parsed.netloc.lower().split(':')[0])
+   key = ','.join(reversed(host.split('.'))) + ')' + (parsed.path or '/')
+   return (key + ('?' + parsed.query if parsed.query else '')).lower()
+
+def warc_write_response(warc, response, body):
+   """
+   Append response records for a requests.Response, and for each redirect
+   that led to it, to WARC, and add them to the CDX entries of that WARC.
+
+   Parameters
+   warc : dict
+      from open_warc
+   response : requests.Response
+      response whose status and headers to record
+   body : bytes
+      body of response (as decoded by requests, so transfer headers such as
+      Content-Encoding are dropped, as in store_http_response)
+
+   Each redirect (3xx) is indexed under the URL requested, with its target
+   in the CDX redirect field, so that warc_lookup can follow it from there.
+   """
+   for hop in response.history:
+      warc_write_record(warc, hop, hop.content)
+   warc_write_record(warc, response, body)
+
+def warc_write_record(warc, response, body):
+   "Append one response record to WARC; see warc_write_response."
+   url = original_url(response.url)
+   redirect = (original_url(urljoin(response.url, response.headers['Location']))
+               if response.is_redirect else '-')
+   headers = [(key, val) for key, val in response.headers.items() 
+              if key.lower() not in ('content-encoding', 'content-length', 
+                 'transfer-encoding', 'connection', 'keep-alive')]
+   headers.append(('Content-Length', str(len(body))))
+   http_block = (f'HTTP/1.1 {response.status_code} {response.reason}\r\n' + 
+      ''.join(f'{key}: {val}\r\n' for key, val in headers) + 
+      '\r\n').encode('iso-8859-1', errors='replace') + body
+   payload_digest = warc_digest(body)
+   offset, length, warc_date = warc_append(
+      warc, 'response', url, 'application/http;msgtype=response', http_block,
+      {'WARC-Payload-Digest': payload_digest, 
+       'WARC-Block-Digest': warc_digest(http_block)})
+   mimetype = response.headers.get('Content-Type', '-').split(';')[0].strip()
+   with warc['lock']:
+      warc['cdx'].append([surt_key(url), re.sub(r'\D', '', warc_date), url,
+         mimetype or '-', str(response.status_code), payload_digest[5:], 
+         redirect, '-', str(length), str(offset), 
+         os.path.basename(warc['path'])])
+
+def close_warc(warc, cdx_path=None):
+   """Close WARC file and write its records' CDX index, sorted by URL key, to
+   cdx_path (default: WARC path with .cdx instead of .warc.gz), merging any
+   entries already in that index."""
+   warc['file'].close()
+   cdx_path = cdx_path or re.sub(r'\.warc(\.gz)?$', '', warc['path']) + '.cdx'
+   lines = [' '.join(fields) for fields in warc['cdx']]
+   if os.path.exists(cdx_path):
+      with open(cdx_path, 'r', encoding='utf-8') as file_in:
+         lines += [line.rstrip('\n') for line in file_in 
+                   if not line.startswith(' CDX')]
+   with open(cdx_path + '.tmp', 'w', encoding='utf-8') as file_out:
+      file_out.write(' CDX N b a m s k r M S V g\n')
+      file_out.writelines(line + '\n' for line in sorted(set(lines)))
+   os.replace(cdx_path + '.tmp', cdx_path)
+   return cdx_path
+
+def read_cdx(cdx_path):
+   "Read CDX index into a DataFrame (one row per record)."
+   return pd.read_csv(cdx_path, sep=' ', skiprows=1, header=None, dtype=str,
+      names=['urlkey', 'timestamp', 'url', 'mimetype', 'status', 'digest', 
+             'redirect', 'meta', 'length', 'offset', 'filename'])\
+      .astype({'length': int, 'offset': int})
+
+def read_warc_record(warc_path, offset, length):
+   """
+   Read one record from WARC file with a single seek.
+
+   Returns
+   dict
+      warc (WARC headers), status (int), headers (HTTP headers), body (bytes)
+   """
+   import gzip
+   
+   with open(warc_path, 'rb') as file_in:
+      file_in.seek(offset)
+      record = gzip.decompress(file_in.read(length))
+   warc_head, _, block = record.partition(b'\r\n\r\n')
+   warc_headers = dict(line.split(': ', 1) for line in 
+                       warc_head.decode('utf-8').split('\r\n')[1:])
+   block = block[:int(warc_headers['Content-Length'])]
+   http_head, _, body = block.partition(b'\r\n\r\n')
+   http_lines = http_head.decode('iso-8859-1').split('\r\n')
+   return dict(warc=warc_headers, status=int(http_lines[0].split(' ')[1]),
+               headers=dict(line.split(': ', 1) for line in http_lines[1:]),
+               body=body)
+
+def warc_lookup(cdx, url, warc_dir='', follow=True, max_hops=10):
+   """Read latest archived response for url, given CDX DataFrame (read_cdx);
+   if follow, follow archived redirects (up to max_hops) to the response 
+   they lead to."""
+   for _ in range(max_hops + 1):
+      rows = cdx.loc[cdx['urlkey'] == surt_key(url)]
+      if len(rows) == 0:
+         return None
+      row = rows.sort_values('timestamp').iloc[-1]
+      if not (follow and row['status'].startswith('3') and 
+              row['redirect'] != '-'):
+         break
+      url = row['redirect']
+   return read_warc_record(join(warc_dir, row['filename']), 
+                           row['offset'], row['length'])
+
+#%% 10. Functions for discovering articles from sitemaps
+
+# Listing articles by walking tables of contents takes hundreds of requests
+# (for EID, 30 volume pages and 315 issue pages of ~475 KB each). Where a
+# site publishes sitemaps (listed on Sitemap: lines of robots.txt), they
+# enumerate its URLs, often with last-modified dates, in a few requests. 
+# Sitemap URLs are filtered with the same regular expressions as anchors 
+# (mmwr_art_re0, eid_art_re, pcd_art_re) and reconciled with the TOC crawl,
+# which is then needed only to verify.
+
+def robots_sitemaps(site_url):
+   "Return URLs on Sitemap: lines of robots.txt for site of site_url."
+   try:
+      response = fetch_url(urljoin(site_url, '/robots.txt'))
+      response.raise_for_status()
+   except requests.exceptions.RequestException as e:
+      print(f'Failed to read robots.txt for {site_url}: {e}')
+      return []
+   return re.findall(r'(?im)^[ \t]*sitemap:[ \t]*(\S+)', response.text)
+
+def read_sitemap(sitemap_url, max_depth=3, seen=None):
+   """
+   Read sitemap (XML, possibly gzipped) and, recursively, the sitemaps in a
+   sitemap index.
+
+   Parameters
+   sitemap_url : str
+      absolute URL of sitemap or sitemap index, e.g., from robots_sitemaps
+   max_depth : int
+      maximum levels of sitemap indexes to follow
+   seen : set
+      sitemap URLs already read, to skip (updated in place)
+
+   Returns
+   pandas.DataFrame
+      url (<loc>), lastmod (<lastmod>, or None), and sitemap (URL of
+      sitemap that lists url)
+   """
+   import gzip
+   from lxml import etree
+   
+   seen = set() if seen is None else seen
+   columns = ['url', 'lastmod', 'sitemap']
+   if sitemap_url in seen:
+      return pd.DataFrame(columns=columns)
+   seen.add(sitemap_url)
+   try:
+      response = fetch_url(sitemap_url)
+      response.raise_for_status()
+   except requests.exceptions.RequestException as e:
+      print(f'Failed to read sitemap {sitemap_url}: {e}')
+      return pd.DataFrame(columns=columns)
+   content = response.content
+   if content[:2] == b'\x1f\x8b': # gzip magic number, e.g., sitemap.xml.gz
+      content = gzip.decompress(content)
+   root = etree.fromstring(content, etree.XMLParser(recover=True, 
+                                                    resolve_entities=False))
+   if root is None:
+      return pd.DataFrame(columns=columns)
+   entries = [dict((etree.QName(child).localname, (child.text or '').strip())
+                   for child in element if isinstance(child.tag, str))
+              for element in root if isinstance(element.tag, str)]
+   if etree.QName(root).localname == 'sitemapindex':
+      if max_depth == 0:
+         return pd.DataFrame(columns=columns)
+      frames = [read_sitemap(entry['loc'], max_depth - 1, seen)
+                for entry in entries if entry.get('loc')]
+      return pd.concat(frames, ignore_index=True) if frames else \
+         pd.DataFrame(columns=columns)
+   return pd.DataFrame([(entry['loc'], entry.get('lastmod'), sitemap_url)
+                        for entry in entries if entry.get('loc')], 
+                       columns=columns)
+
+def sitemap_articles(sitemap_urls, art_re, cc_df=None):
+   """
+   List candidate articles from sitemaps, reconciled with TOC crawl.
+
+   Parameters
+   sitemap_urls : str or list of str
+      site URL (to find sitemaps in robots.txt) or sitemap URLs
+   art_re : compiled regular expression
+      filter for article URLs, as for anchor hrefs, e.g., eid_art_re
+   cc_df : pandas.DataFrame
+      articles found by TOC crawl (e.g., articles_dframe), with url column
+
+   Returns
+   pandas.DataFrame
+      base (sitemap), href, url, path, filename, mirror_path, string (''),
+      lastmod (as datetime), and found ('both', 'sitemap', or 'toc' if
+      cc_df is given), one row per url
+   """
+   if isinstance(sitemap_urls, str):
+      sitemap_urls = robots_sitemaps(sitemap_urls)
+   seen = set()
+   sitemap = pd.concat([read_sitemap(url, seen=seen) for url in sitemap_urls] +
+                       [pd.DataFrame(columns=['url', 'lastmod', 'sitemap'])],
+                       ignore_index=True)
+   sitemap = sitemap.loc[[art_re.search(urlparse(url).path) is not None 
+                          for url in sitemap['url']]]
+   articles = process_hrefs(sitemap['url'], sitemap['sitemap'])
+   articles['lastmod'] = pd.to_datetime(sitemap['lastmod'].to_numpy(), 
+                                        errors='coerce', utc=True, 
+                                        format='ISO8601')
+   articles = articles.drop_duplicates('url', keep='last')
+   if cc_df is None:
+      return articles.reset_index(drop=True)
+   articles = articles.merge(cc_df[['url']].drop_duplicates(), on='url', 
+                             how='outer', indicator='found')
+   articles['found'] = articles['found'].astype(str).map(
+      {'both': 'both', 'left_only': 'sitemap', 'right_only': 'toc'})
+   return articles
+
+#%% 11. Functions for caching HTTP responses on disk
+
+# Re-running the discovery cells of a 1_mirror_*.py script re-fetches the
+# same home, series, and volume pages. With an HTTP cache open, 
+# get_html_from_url keeps each response body in a SQLite file for as long as
+# its headers allow (Cache-Control max-age, or Expires), or ttl seconds if
+# they don't say; stale entries are revalidated with a conditional request,
+# and a 304 response renews them without a body. min_ttl keeps entries at
+# least that long whatever the headers say, so that during development a
+# re-run costs no requests at all. Least recently used entries are evicted
+# once the (compressed) bodies exceed max_bytes.
+#    cache: url, body (zlib), etag, last_modified, expires, accessed, size
+
+_http_cache = dict(con=None, lock=threading.Lock(), ttl=3600, min_ttl=0,
+                   max_bytes=256 * 2**20)
+
+def http_cache(cache_path=None, ttl=3600, min_ttl=0, max_bytes=256 * 2**20):
+   "Open HTTP cache at cache_path for get_html_from_url; close it if None."
+   with _http_cache['lock']:
+      if _http_cache['con'] is not None:
+         _http_cache['con'].close()
+         _http_cache['con'] = None
+      if cache_path is not None:
+         con = sqlite3.connect(cache_path, check_same_thread=False)
+         con.execute("""CREATE TABLE IF NOT EXISTS cache (
+            url TEXT PRIMARY KEY, body BLOB, etag TEXT, last_modified TEXT,
+            expires REAL, accessed REAL, size INTEGER)""")
+         con.commit()
+         _http_cache.update(con=con, ttl=ttl, min_ttl=min_ttl, 
+                            max_bytes=max_bytes)
+
+def cache_lifetime(headers, ttl=3600, min_ttl=0):
+   """Seconds for which a response with headers stays fresh in cache, or None
+   if it must not be stored (Cache-Control: no-store, unless min_ttl > 0)."""
+   from email.utils import parsedate_to_datetime
+   
+   cache_control = headers.get('Cache-Control', '').lower()
+   max_age = re.search(r'(?:s-maxage|max-age)\s*=\s*"?(\d+)', cache_control)
+   if 'no-store' in cache_control and min_ttl <= 0:
+      return None
+   if 'no-cache' in cache_control:
+      lifetime = 0
+   elif max_age:
+      lifetime = int(max_age.group(1)) - int(headers.get('Age', 0) or 0)
+   elif headers.get('Expires'):
+      try:
+         expires = parsedate_to_datetime(headers['Expires']).timestamp()
+         date = (parsedate_to_datetime(headers['Date']).timestamp()
+                 if headers.get('Date') else time.time())
+         lifetime = expires - date
+      except (TypeError, ValueError):
+         lifetime = 0 # invalid Expires means already expired
+   else:
+      lifetime = ttl
+   return max(lifetime, min_ttl, 0)
+
+def cache_get(url):
+   "Return cache entry for url as dict (body decompressed), or None."
+   with _http_cache['lock']:
+      con = _http_cache['con']
+      if con is None:
+         return None
+      row = con.execute("""SELECT body, etag, last_modified, expires 
+                           FROM cache WHERE url = ?""", (url,)).fetchone()
+      if row is None:
+         return None
+      with con:
+         con.execute('UPDATE cache SET accessed = ? WHERE url = ?', 
+                     (time.time(), url))
+   return dict(body=zlib.decompress(row[0]), etag=row[1], 
+               last_modified=row[2], expires=row[3])
+
+def cache_put(url, body, headers, entry=None):
+   """Store response body with headers in cache, unless headers forbid it; 
+   validators missing from headers (e.g., of a 304) are kept from entry."""
+   entry = entry or dict()
+   with _http_cache['lock']:
+      con = _http_cache['con']
+      if con is None:
+         return
+      lifetime = cache_lifetime(headers, _http_cache['ttl'], 
+                                _http_cache['min_ttl'])
+      if lifetime is None:
+         with con:
+            con.execute('DELETE FROM cache WHERE url = ?', (url,))
+         return
+      now = time.time()
+      compressed = zlib.compress(body)
+      with con:
+         con.execute('INSERT OR REPLACE INTO cache VALUES (?, ?, ?, ?, ?, ?, ?)',
+            (url, compressed, headers.get('ETag') or entry.get('etag'),
+             headers.get('Last-Modified') or entry.get('last_modified'),
+             now + lifetime, now, len(compressed)))
+         # evict least recently used entries, down to 90% of max_bytes
+         total = con.execute('SELECT SUM(size) FROM cache').fetchone()[0]
+         if total > _http_cache['max_bytes']:
+            for evict_url, size in con.execute(
+                  'SELECT url, size FROM cache ORDER BY accessed').fetchall():
+               if total <= 0.9 * _http_cache['max_bytes']:
+                  break
+               con.execute('DELETE FROM cache WHERE url = ?', (evict_url,))
+               total -= size
+
+def cached_content(url, timeout=None):
+   """Return body of response for url, from HTTP cache if fresh there (see 
+   http_cache), else from fetch_url; raise for error status."""
+   entry = cache_get(url)
+   if entry is not None and entry['expires'] > time.time():
+      return entry['body']
+   response = fetch_url(url, timeout=timeout, 
+                        headers=conditional_headers(entry))
+   if response.status_code == 304 and entry is not None:
+      cache_put(url, entry['body'], response.headers, entry)
+      return entry['body']
+   response.raise_for_status()
+   cache_put(url, response.content, response.headers)
+   return response.content
+
+#%% 12. Functions for remembering redirects
+
+# Many legacy URLs (e.g., /mmwr/preview/mmwrhtml/..., /pcd/es/...) redirect
+# before serving content, at the cost of an extra round trip each time. With
+# a redirect map loaded, fetch_url records the final URL of each redirected
+# request and, on later requests, goes straight to it. An entry is dropped
+# (and the original URL requested) if its final URL returns 404 or 410, and
+# replaced if the final URL itself now redirects. The map is stored as JSON:
+#    {url: final_url}
+
+_redirect_map = dict(map=None, lock=threading.Lock())
+
+def load_redirect_map(path=None):
+   """Load redirect map from JSON file at path (or start an empty one), and 
+   use it in fetch_url; path=None stops using any redirect map."""
+   redirects = None
+   if path is not None:
+      redirects = dict()
+      if os.path.exists(path):
+         with open(path, 'r', encoding='utf-8') as file_in:
+            redirects = json.load(file_in)
+   with _redirect_map['lock']:
+      _redirect_map['map'] = redirects
+   return redirects
+
+def save_redirect_map(path):
+   "Write redirect map in use to JSON file, replacing any previous version."
+   with _redirect_map['lock']:
+      redirects = dict(_redirect_map['map'] or {})
+   with open(path + '.tmp', 'w', encoding='utf-8') as file_out:
+      json.dump(redirects, file_out, indent=1, sort_keys=True)
+   os.replace(path + '.tmp', path)
+
+def redirect_target(url):
+   "Return final URL recorded for url in redirect map, else url itself."
+   with _redirect_map['lock']:
+      redirects = _redirect_map['map']
+      return url if redirects is None else redirects.get(url, url)
+
+def note_redirect(url, target, response):
+   """Update redirect map from response to request for url (sent to target);
+   return True if target is gone and url should be requested again."""
+   with _redirect_map['lock']:
+      redirects = _redirect_map['map']
+      if redirects is None:
+         return False
+      if target != url and response.status_code in (404, 410):
+         del redirects[url]
+         return True
+      if response.history and response.status_code < 400:
+         final = original_url(response.url)
+         if final != url:
+            redirects[url] = final
+         else:
+            redirects.pop(url, None)
+      return False
+
+def redirect_dframe(paths):
+   """Combine redirect maps from JSON files into DataFrame: url, final_url.
+   Files that do not exist (e.g., journals not mirrored) are skipped."""
+   redirects = dict()
+   for path in [paths] if isinstance(paths, str) else paths:
+      if not os.path.exists(path):
+         print(f'{path} not found; skipped')
+         continue
+      with open(path, 'r', encoding='utf-8') as file_in:
+         redirects.update(json.load(file_in))
+   return pd.DataFrame(list(redirects.items()), columns=['url', 'final_url'])
+
+#%% 13. Functions for detecting duplicate content
+
+# The same document is sometimes reachable under several URLs, which the
+# mirror scripts otherwise find by reviewing duplicates and dropping rows by
+# hand. A content index maps the SHA-1 digest of each mirrored body to the
+# first path mirrored with that content and flags every later path with 
+# identical content as a duplicate of it; on disk, a duplicate is a hard 
+# link to the first file, so it takes no additional space. It is stored as
+# JSON:
+#    {'hashes': {sha1: path}, 'paths': {path: sha1}, 
+#     'dupes': {path: original path}}
+
+# reentrant, so mirror_raw_html can hold it while indexing and placing a file
+_content_index_lock = threading.RLock()
+
+def load_content_index(path):
+   "Read content index from JSON file; return empty index if none exists."
+   if not os.path.exists(path):
+      return dict(hashes=dict(), paths=dict(), dupes=dict())
+   with open(path, 'r', encoding='utf-8') as file_in:
+      return json.load(file_in)
+
+def save_content_index(index, path):
+   "Write content index to JSON file, replacing any previous version whole."
+   with _content_index_lock:
+      with open(path + '.tmp', 'w', encoding='utf-8') as file_out:
+         json.dump(index, file_out, indent=1, sort_keys=True)
+   os.replace(path + '.tmp', path)
+
+def content_index_add(index, sha1, path):
+   """Add content digest of path to index; return path of earlier file with
+   same content (flagging path as its duplicate), or None if content new."""
+   with _content_index_lock:
+      # content of path has changed; it no longer represents its old digest,
+      # so the first of its duplicates (if any) takes its place
+      old_sha1 = index['paths'].get(path)
+      if old_sha1 not in (None, sha1) and index['hashes'].get(old_sha1) == path:
+         dependents = sorted(dupe for dupe, original in index['dupes'].items()
+                             if original == path)
+         if dependents:
+            index['hashes'][old_sha1] = dependents[0]
+            del index['dupes'][dependents[0]]
+            for dupe in dependents[1:]:
+               index['dupes'][dupe] = dependents[0]
+         else:
+            del index['hashes'][old_sha1]
+      index['paths'][path] = sha1
+      original = index['hashes'].setdefault(sha1, path)
+      if original == path:
+         index['dupes'].pop(path, None)
+         return None
+      index['dupes'][path] = original
+      return original
+
+def link_file(original, link_path):
+   "Create hard link to original at link_path; return False if impossible."
+   try:
+      os.link(original, link_path)
+      return True
+   except (OSError, NotImplementedError, AttributeError):
+      return False
+
+def content_dupes(index, base_path=''):
+   """List duplicates flagged in content index as DataFrame: mirror_path and
+   dupe_of (relative to base_path), e.g., to drop from *_cc_df."""
+   dupes = pd.DataFrame(list(index['dupes'].items()), 
+                        columns=['mirror_path', 'dupe_of'])
+   for column in ['mirror_path', 'dupe_of']:
+      dupes[column] = dupes[column].str.slice(len(base_path))
+   return dupes.sort_values('mirror_path').reset_index(drop=True)
+
+#%% 14. Functions for verifying mirrors against mirror lists
+
+# csv-output/cdc_mirror_list_*.csv record the Length and CRC-32 of every 
+# mirrored file. A mirror tree or a set of zip archives can be checked 
+# against such a list by computing each file's CRC-32 in a pool of threads;
+# zlib releases the GIL while it computes (as it does while inflating), so 
+# threads run in parallel. Each listed file is reported as ok, missing, 
+# truncated (shorter than listed), oversized (longer than listed), or 
+# corrupted (listed length but different CRC-32).
+
+def file_crc32(path, chunk_size=1 << 20):
+   "Return (length, CRC-32 as 8 hex digits) of file, or None if missing."
+   import mmap
+   
+   try:
+      with open(path, 'rb') as file_in:
+         length = os.fstat(file_in.fileno()).st_size
+         if length == 0:
+            return 0, f'{0:08x}'
+         try:
+            with mmap.mmap(file_in.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+               return length, f'{zlib.crc32(mm):08x}'
+         except (OSError, ValueError): # e.g., file system without mmap
+            crc32 = 0
+            while chunk := file_in.read(chunk_size):
+               crc32 = zlib.crc32(chunk, crc32)
+            return length, f'{crc32:08x}'
+   except FileNotFoundError:
+      return None
+
+def zip_member_crc32(zip_in, name, chunk_size=1 << 20):
+   """Return (length, CRC-32 as 8 hex digits) of inflated zip member, or None
+   if absent; (length so far, None) if member cannot be read in full or does
+   not match CRC-32 in its own header."""
+   if name not in zip_in.NameToInfo:
+      return None
+   length, crc32 = 0, 0
+   try:
+      with zip_in.open(name) as member:
+         while chunk := member.read(chunk_size):
+            length += len(chunk)
+            crc32 = zlib.crc32(chunk, crc32)
+   except (zipfile.BadZipFile, zlib.error, EOFError):
+      return length, None
+   return length, f'{crc32:08x}'
+
+def mirror_status(listed_length, listed_crc32, found):
+   "Classify file against mirror list, given (length, CRC-32) found or None."
+   if found is None:
+      return 'missing'
+   length, crc32 = found
+   if length < listed_length:
+      return 'truncated'
+   if length > listed_length:
+      return 'oversized'
+   return 'ok' if crc32 == listed_crc32 else 'corrupted'
+
+def verify_mirror(mirror_list_csv, base_path=None, zip_paths=None, 
+                  series=None, max_workers=8, progress=True):
+   """
+   Verify mirror tree or zip archives against a mirror list.
+
+   Parameters
+   mirror_list_csv : str
+      path to CSV file such as csv-output/cdc_mirror_list_1982-2024.csv
+   base_path : str
+      root of local mirror tree, under which each Name is found
+   zip_paths : list of str
+      zip archives (e.g., html-mirrors/*.zip) in which to find each Name
+      instead; a Name in several archives is checked in the last
+   series : str or list of str
+      limit verification to these values of Series, e.g., 'pcd'
+   max_workers : int
+      number of threads computing CRC-32
+   progress : bool
+      whether to show tqdm progress bar
+
+   Returns
+   pandas.DataFrame
+      mirror list with length and crc32 found and status (ok, missing,
+      truncated, oversized, corrupted), e.g., for .status.value_counts()
+   """
+   mirror_list = pd.read_csv(mirror_list_csv, dtype={'CRC-32': str})
+   if series is not None:
+      series = [series] if isinstance(series, str) else series
+      mirror_list = mirror_list.loc[mirror_list['Series'].isin(series)]
+   mirror_list = mirror_list.reset_index(drop=True)
+   mirror_list['CRC-32'] = mirror_list['CRC-32'].str.zfill(8)
+   names = list(mirror_list['Name'])
+
+   zips, where = [], dict()
+   for zip_path in zip_paths or []:
+      zips.append(zipfile.ZipFile(normpath(expanduser(zip_path))))
+      where.update({name: zips[-1] for name in zips[-1].NameToInfo})
+
+   def check(name):
+      if zip_paths is None:
+         return file_crc32(join(base_path, *name.split('/')))
+      return zip_member_crc32(where[name], name) if name in where else None
+
+   try:
+      with ThreadPoolExecutor(max_workers=max_workers) as pool:
+         found = list(tqdm(pool.map(check, names), total=len(names),
+                           disable=not progress))
+   finally:
+      for zip_in in zips:
+         zip_in.close()
+   mirror_list['length'] = pd.array(
+      [None if x is None else x[0] for x in found], dtype='Int64')
+   mirror_list['crc32'] = [None if x is None else x[1] for x in found]
+   mirror_list['status'] = [
+      mirror_status(length, crc32, x) for length, crc32, x 
+      in zip(mirror_list['Length'], mirror_list['CRC-32'], found)]
+   return mirror_list
+
+#%% 15. Content-addressed store of documents
+
+# Stage 2 produced whole-corpus pickles for each variant (*_raw, *_uni, 
+# *_unx), and each later script unpickled all of them to reach any one
+# document. A DocStore keeps all collections and variants in one SQLite file
+# and behaves like the dict it replaces, reading each document only when it
+# is accessed. Bodies are stored once for each distinct content (by SHA-1 of
+# content, compressed), so identical documents, or variants that a step 
+# left unchanged, take no additional space. A body no longer referenced by
+# any document (once replaced or deleted) is removed; vacuum() then returns
+# the space it took to the filesystem.
+#    docs:  collection, variant, mirror_path, sha1, kind ('b' bytes, 'u' str)
+#    blobs: sha1, body (zlib)
+
+def open_doc_store(db_path):
+   "Open (or create) SQLite file for DocStore."
+   con = sqlite3.connect(db_path, check_same_thread=False)
+   con.executescript("""
+      CREATE TABLE IF NOT EXISTS docs (
+         collection TEXT, variant TEXT, mirror_path TEXT, sha1 TEXT, kind TEXT,
+         PRIMARY KEY (collection, variant, mirror_path));
+      CREATE INDEX IF NOT EXISTS docs_sha1 ON docs (sha1);
+      CREATE TABLE IF NOT EXISTS blobs (sha1 TEXT PRIMARY KEY, body BLOB);""")
+   return con
+
+class DocStore(MutableMapping):
+   """
+   Dict-like, lazily read collection of documents {mirror_path: html}, for
+   one variant of one collection, e.g., 
+      mmwr_art_unx = DocStore('cdc_docs.sqlite', 'mmwr_art', 'unx')
+
+   Parameters
+   db_path : str or sqlite3.Connection
+      SQLite file (see open_doc_store), or connection to one
+   collection : str
+      e.g., 'mmwr_toc', 'eid_art'
+   variant : str
+      e.g., 'raw' (bytes), 'uni', 'unx' (str)
+
+   Documents are iterated in order of mirror_path; values are bytes or str,
+   as stored. update() writes many documents in a single transaction.
+   """
+   def __init__(self, db_path, collection, variant):
+      self.con = (db_path if isinstance(db_path, sqlite3.Connection)
+                  else open_doc_store(db_path))
+      self.key = (collection, variant)
+
+   @staticmethod
+   def _encode(value):
+      import hashlib
+      kind, body = ('b', value) if isinstance(value, bytes) else \
+                   ('u', value.encode('utf-8'))
+      return hashlib.sha1(body).hexdigest(), kind, body
+
+   @staticmethod
+   def _decode(kind, body):
+      body = zlib.decompress(body)
+      return body if kind == 'b' else body.decode('utf-8')
+
+   def __getitem__(self, path):
+      row = self.con.execute("""SELECT kind, body FROM docs JOIN blobs 
+         USING (sha1) WHERE collection = ? AND variant = ? AND mirror_path = ?""",
+         self.key + (path,)).fetchone()
+      if row is None:
+         raise KeyError(path)
+      return self._decode(*row)
+
+   def __setitem__(self, path, value):
+      self.update({path: value})
+
+   def __delitem__(self, path):
+      sha1 = self.sha1(path)
+      if sha1 is None:
+         raise KeyError(path)
+      with self.con:
+         self.con.execute("""DELETE FROM docs WHERE collection = ? 
+            AND variant = ? AND mirror_path = ?""", self.key + (path,))
+         self._prune([sha1])
+
+   def __contains__(self, path):
+      return self.sha1(path) is not None
+
+   def __iter__(self):
+      for (path,) in self.con.execute("""SELECT mirror_path FROM docs 
+            WHERE collection = ? AND variant = ? ORDER BY mirror_path""", 
+            self.key).fetchall():
+         yield path
+
+   def __len__(self):
+      return self.con.execute("""SELECT COUNT(*) FROM docs 
+         WHERE collection = ? AND variant = ?""", self.key).fetchone()[0]
+
+   def __repr__(self):
+      return f'DocStore({self.key[0]!r}, {self.key[1]!r}, {len(self)} documents)'
+
+   def _rows(self):
+      # one query for all documents, rather than one for each
+      cursor = self.con.execute("""SELECT mirror_path, kind, body FROM docs 
+         JOIN blobs USING (sha1) WHERE collection = ? AND variant = ? 
+         ORDER BY mirror_path""", self.key)
+      for path, kind, body in cursor:
+         yield path, self._decode(kind, body)
+
+   def items(self):
+      return _DocStoreItems(self)
+
+   def values(self):
+      return _DocStoreValues(self)
+
+   def update(self, other=(), **kwargs):
+      "Store many documents {mirror_path: html} in a single transaction."
+      docs = dict(other, **kwargs)
+      rows = [(path,) + self._encode(value) for path, value in docs.items()]
+      with self.con:
+         replaced = set()
+         paths = list(docs)
+         for k in range(0, len(paths), 500): # within SQLite's limit on ?s
+            batch = paths[k:k + 500]
+            replaced.update(sha1 for (sha1,) in self.con.execute(f"""SELECT 
+               sha1 FROM docs WHERE collection = ? AND variant = ? AND 
+               mirror_path IN ({', '.join('?' * len(batch))})""", 
+               self.key + tuple(batch)))
+         self.con.executemany('INSERT OR IGNORE INTO blobs VALUES (?, ?)',
+            [(sha1, zlib.compress(body)) for _, sha1, _, body in rows])
+         self.con.executemany('INSERT OR REPLACE INTO docs VALUES (?, ?, ?, ?, ?)',
+            [self.key + (path, sha1, kind) for path, sha1, kind, _ in rows])
+         self._prune(replaced - {sha1 for _, sha1, _, _ in rows})
+
+   def _prune(self, sha1s):
+      # remove bodies no longer referenced by any document (in any collection)
+      self.con.executemany("""DELETE FROM blobs WHERE sha1 = ? AND NOT EXISTS 
+         (SELECT 1 FROM docs WHERE docs.sha1 = blobs.sha1)""", 
+         [(sha1,) for sha1 in sha1s])
+
+   def vacuum(self):
+      """Remove any body not referenced by a document, and compact SQLite 
+      file (for all collections and variants)."""
+      with self.con:
+         self.con.execute("""DELETE FROM blobs WHERE NOT EXISTS 
+            (SELECT 1 FROM docs WHERE docs.sha1 = blobs.sha1)""")
+      self.con.execute('VACUUM')
+
+   def sha1(self, path):
+      "Return SHA-1 of content stored for mirror_path (None if absent)."
+      row = self.con.execute("""SELECT sha1 FROM docs WHERE collection = ? 
+         AND variant = ? AND mirror_path = ?""", self.key + (path,)).fetchone()
+      return None if row is None else row[0]
+
+class _DocStoreItems(ItemsView):
+   def __iter__(self):
+      yield from self._mapping._rows()
+
+class _DocStoreValues(ValuesView):
+   def __iter__(self):
+      for _, value in self._mapping._rows():
+         yield value
+
+#%% 16. Functions for transforming documents in parallel
+
+# Steps of stage 2 (html_to_unicode_b, ent_repair with html_reduce_space_u,
+# trim_svg) transform each document independently of all others, so they 
+# can run in a pool of processes (threads would contend for the GIL). 
+# Documents are sent to workers in chunks, to limit the cost of passing 
+# them between processes, and results are collected in the order of the 
+# input, so the resulting dict matches that of a dict comprehension.
+# Workers start by the platform's default method. Spawned workers (the 
+# default on Windows and macOS) import each function by its module, so the
+# transforms of stage 2 are defined in html_transforms.py; only forked 
+# workers (the default on Linux) also reach functions defined in a script
+# or console (__main__). Where they cannot, fn runs in this process, with a
+# warning.
+
+def map_docs(fn, docs, processes=None, chunksize=64, progress=True, **kwargs):
+   """
+   Apply fn to each document in parallel processes, preserving order.
+
+   Parameters
+   fn : function
+      transforms one document, called as fn(doc, **kwargs)
+   docs : dict-like
+      {mirror_path: document}, e.g., dict or DocStore
+   processes : int or None
+      number of worker processes (default: number of CPUs); 1 runs in this
+      process, without a pool, as does a function defined in __main__ where
+      workers are not forked
+   chunksize : int
+      number of documents sent to a worker at a time
+   progress : bool
+      show progress bar
+
+   Returns
+   dict
+      {mirror_path: fn(document)}, in the same order as docs
+   """
+   fn_ = partial(fn, **kwargs) if kwargs else fn
+   paths, values = zip(*docs.items()) if len(docs) else ((), ())
+   serial = processes == 1
+   if not serial and (multiprocessing.get_start_method() != 'fork' and 
+                      getattr(fn, '__module__', None) == '__main__'):
+      print(f'{fn.__name__} is defined in __main__, which spawned workers '
+            'cannot import; running in this process')
+      serial = True
+   if serial:
+      return {path: fn_(doc) for path, doc in tqdm(
+         zip(paths, values), total=len(paths), disable=not progress)}
+   with ProcessPoolExecutor(max_workers=processes) as executor:
+      # map yields results in order of input, however workers finish
+      results = executor.map(fn_, values, chunksize=chunksize)
+      return dict(zip(paths, tqdm(results, total=len(paths), 
+                                  disable=not progress)))
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Mirror MMWR, EID, and PCD together, in a single concurrent crawl
+
+@author: cmheilig
+
+Sections of this script:
+0. Set up environment
+1. Assemble files to mirror for each journal (from *_cc_df)
+2. Mirror all 3 journals concurrently
+3. Review and save
+
+Requires mmwr_cc_df, eid_cc_df, and pcd_cc_df from sections 1-4 of
+1_mirror_mmwr.py, 1_mirror_eid.py, and 1_mirror_pcd.py.
+
+Main product: mirror_summary (files, failures, and throughput by journal)
+"""
+
+#%% 0. Set up environment
+# import from 0_cdc-corpora-header.py
+
+# os.chdir('/Users/cmheilig/cdc-corpora/_test')
+os.chdir(r'C:\Temp\mirror_2024')
+
+CDC_BASE_PATH_b0 = normpath(expanduser('~/cdc-corpora'))
+
+#%% 1. Assemble files to mirror for each journal
+mmwr_cc_df = pd.read_pickle('pickle-files/mmwr_cc_df.pkl')
+eid_cc_df = pd.read_pickle('pickle-files/eid_cc_df.pkl')
+pcd_cc_df = pd.read_pickle('pickle-files/pcd_cc_df.pkl')
+
+# same selections as section 5 of each 1_mirror_*.py script
+mmwr_cc_df_ = mmwr_cc_df.loc[
+    mmwr_cc_df.url.str.contains('/7[23]/') |
+    mmwr_cc_df.url.str.contains('/mmwr/mmwr_(wk|rr|ss|su)/') |
+    mmwr_cc_df.url.str.contains('/mmwr/ind.*202[34]'), :]
+eid_cc_df_ = eid_cc_df.loc[
+    eid_cc_df.url.str.contains('/(29|30)/') |
+    eid_cc_df.url.str.contains('volume-(29|30)'), :]
+pcd_cc_df_ = pcd_cc_df.loc[pcd_cc_df.url.str.contains('/202[34]'), :]
+
+mirror_cc_df = {'mmwr': mmwr_cc_df_, 'eid': eid_cc_df_, 'pcd': pcd_cc_df_}
+x = create_mirror_tree(CDC_BASE_PATH_b0, calculate_mirror_dirs(
+    pd.concat([cc_df.path for cc_df in mirror_cc_df.values()])))
+
+mirror_jobs = {journal: dict(
+    urls=cc_df.url, mirror_paths=cc_df.mirror_path, base_path=CDC_BASE_PATH_b0,
+    manifest=load_mirror_manifest(f'{journal}_manifest.json'),
+    dedup=load_content_index(f'{journal}_content.json'))
+    for journal, cc_df in mirror_cc_df.items()}
+
+#%% 2. Mirror all 3 journals concurrently
+# MMWR and PCD share www.cdc.gov, EID is on wwwnc.cdc.gov; each journal may
+# make up to per_host simultaneous requests to its host
+# optionally, also keep each response's status and headers (not only its 
+# body) in a WARC file, with a sorted CDX index for single-seek readback
+# mirror_warc = open_warc('cdc_2024.warc.gz')
+# for job in mirror_jobs.values():
+#     job['warc'] = mirror_warc
+
+# final URLs of redirected requests, requested directly on later runs
+load_redirect_map('cdc_redirects.json')
+# log every request (status, bytes, latency, retries) as it happens
+log_fetches('fetch_log_2024.csv')
+mirror_sizes, mirror_summary = mirror_journals(
+    mirror_jobs, max_workers=32, per_host=4)
+log_fetches(None)
+# close_warc(mirror_warc) # writes cdc_2024.cdx
+# warc_lookup(read_cdx('cdc_2024.cdx'), 'https://www.cdc.gov/pcd/index.htm')
+
+for journal, job in mirror_jobs.items():
+    save_mirror_manifest(job['manifest'], f'{journal}_manifest.json')
+    save_content_index(job['dedup'], f'{journal}_content.json')
+save_redirect_map('cdc_redirects.json')
+
+#%% 3. Review and save
+mirror_summary
+host_limits_summary()
+# byte-identical documents under more than one URL, by journal
+mirror_dupes = {journal: content_dupes(job['dedup'], CDC_BASE_PATH_b0)
+                for journal, job in mirror_jobs.items()}
+
+# tail latency by host and year; many 429/503 (throttled) or climbing 
+# latencies suggest fewer workers per host
+fetch_log = read_fetch_log('fetch_log_2024.csv')
+summarize_fetch_log(fetch_log)
+# fetch_log.to_parquet('fetch_log_2024.parquet') # requires pyarrow
+
+# sizes in the same form as section 5 of each 1_mirror_*.py script
+mmwr_sizes_b0, eid_sizes_b0, pcd_sizes_b0 = (
+    mirror_sizes['mmwr'], mirror_sizes['eid'], mirror_sizes['pcd'])
+# pickle.dump(mirror_sizes, open('mirror_sizes_b0.pkl', 'wb'))
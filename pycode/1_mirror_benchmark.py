@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark mirroring offline, against recorded responses on a local server
+
+@author: cmheilig
+
+Sections of this script:
+0. Set up environment
+1. Construct store of recorded responses (seeded from html-mirrors/pcd_2024.zip)
+2. Replay with latency and injected failures; mirror and time
+3. Compare settings for concurrency
+
+Main product: bench_df (throughput and failures by setting)
+"""
+
+#%% 0. Set up environment
+# import from 0_cdc-corpora-header.py
+
+# os.chdir('/Users/cmheilig/cdc-corpora/_test')
+os.chdir(r'C:\Temp\bench_2024')
+
+#%% 1. Construct store of recorded responses
+# either seed from a zipped mirror...
+bench_store = open_http_store('bench_store.sqlite')
+seed_http_store(bench_store, 'html-mirrors/pcd_2024.zip') # 104
+
+# ...or record responses during a live crawl (e.g., sections 0-3 of a
+# 1_mirror_*.py script), then stop recording
+# record_http_responses('bench_store.sqlite')
+# record_http_responses(None)
+
+bench_df_ = pd.read_sql_query('SELECT url FROM responses', bench_store)
+bench_df_['path'] = bench_df_.url.map(lambda url: urlparse(url).path)
+bench_df_['mirror_path'] = bench_df_.path
+bench_store.close()
+
+BENCH_BASE_PATH_b0 = normpath(expanduser('~/cdc-corpora-bench'))
+x = create_mirror_tree(BENCH_BASE_PATH_b0, calculate_mirror_dirs(bench_df_.path))
+
+#%% 2. Replay with latency and injected failures; mirror and time
+# 100-300 ms per response, 5% 503 responses, 1% dropped connections
+bench_server = start_replay_server('bench_store.sqlite', port=8000,
+   latency=(0.1, 0.3), error_rate=0.05, reset_rate=0.01, seed=2024)
+
+log_fetches('bench_fetch_log.csv')
+bench_start = time.monotonic()
+bench_sizes_b0 = mirror_raw_html_pool(
+   bench_df_.url, bench_df_.mirror_path, BENCH_BASE_PATH_b0)
+bench_secs = time.monotonic() - bench_start
+log_fetches(None)
+# sum([x==0 for x in bench_sizes_b0]) # 0
+# len(bench_sizes_b0) / bench_secs    # files per second
+host_limits_summary()
+summarize_fetch_log(read_fetch_log('bench_fetch_log.csv'), by=['host'])
+
+#%% 3. Compare settings for concurrency
+# each run starts from fresh rate limits, set high enough (max_rate) that
+# the pool, not the token bucket, limits throughput
+bench_hosts = bench_df_.url.map(lambda url: urlparse(url).netloc).unique()
+
+def bench_run(max_workers, per_host, max_rate=1000.0):
+   reset_host_limits()
+   for host in bench_hosts:
+      configure_host_limit(host, rate=max_rate, max_rate=max_rate, 
+                           burst=max_workers)
+   start = time.monotonic()
+   sizes = mirror_raw_html_pool(
+      bench_df_.url, bench_df_.mirror_path, BENCH_BASE_PATH_b0,
+      max_workers=max_workers, per_host=per_host, progress=False)
+   secs = time.monotonic() - start
+   return dict(max_workers=max_workers, per_host=per_host, max_rate=max_rate,
+               files=len(sizes), failed=sum([x==0 for x in sizes]), secs=secs,
+               files_per_sec=len(sizes) / secs)
+
+bench_df = pd.DataFrame([bench_run(max_workers, per_host)
+   for max_workers, per_host in [(1, 1), (4, 4), (16, 4), (16, 8), (32, 16)]])
+
+bench_server.shutdown()
+replay_http(None)
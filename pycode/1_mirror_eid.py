@@ -22,6 +22,12 @@ Main product: eid_cc_df
 # os.chdir('/Users/cmheilig/cdc-corpora/_test')
 os.chdir(r"C:\Temp\eid_2024")
 
+# crawl frontier: anchors and pages retrieved so far, so that a restart resumes
+crawl_db = open_crawl_frontier('eid_frontier.sqlite')
+# HTTP cache for pages retrieved with get_html_from_url, so that re-running
+# discovery cells during development makes no requests (min_ttl in seconds)
+# http_cache('eid_http_cache.sqlite', min_ttl=24*60*60)
+
 
 #%% 0. Start with EID home https://wwwnc.cdc.gov/eid/
 
@@ -113,15 +119,15 @@ volumes_dframe = pd.DataFrame(
 # 28   /eid/past-issues/volume-2   Volume 2—1996
 # 29   /eid/past-issues/volume-1   Volume 1—1995
 
-volumes_html = [get_html_from_url_(url) for url in volumes_dframe.url]
+frontier_save(crawl_db, 'volume', volumes_dframe)
+# volumes_html = [get_html_from_url_(url) for url in volumes_dframe.url]
+volumes_html = frontier_fetch(crawl_db, 'volume', volumes_dframe.url)
 # [len(x) for x in volumes_html]
 # [336593, 334400, 335501, 334403, 334403, 334400, 334397, 335454, 334395, ...]
-volumes_soup = [BeautifulSoup(html, 'lxml') for html in volumes_html]
+# volumes_soup = [BeautifulSoup(html, 'lxml') for html in volumes_html]
 
 # review all anchor-refs from volumes URLs
-# pd.DataFrame([process_aTag(aTag, url) 
-#     for soup, url in zip(volumes_soup, volumes_dframe.url) 
-#     for aTag in soup.find_all('a', href=True)])\
+# anchors_dframe(volumes_html, volumes_dframe.url)\
 #     .to_excel('eid-volumes-anchors.xlsx', engine='openpyxl', freeze_panes=(1,0))
 # [6630 rows x 7 columns]
 
@@ -133,14 +139,15 @@ volumes_soup = [BeautifulSoup(html, 'lxml') for html in volumes_html]
 # They also all have string 'Table of Contents'
 
 eid_iss_re = re.compile(r'Table of Contents')
-issues_a = [soup.find_all('a', string=eid_iss_re) for soup in volumes_soup]
+# issues_a = [soup.find_all('a', string=eid_iss_re) for soup in volumes_soup]
+# extract anchor records directly, without constructing soups
+issues_a = [extract_anchors(html, url, string=eid_iss_re)
+            for html, url in zip(volumes_html, volumes_dframe.url)]
 issues_a_n = [len(x) for x in issues_a] # sum(issues_a_n) # 315
 # [14, 12, 13, 12, 12, 12, 12, 13, 12, 12, 12, 12, 12, 12, 12, 
 #  12, 12, 12, 12, 12, 12, 12, 12,  7,  6,  6,  4,  4,  4,  4]
 
-issues_dframe = pd.DataFrame([process_aTag(aTag, url) 
-   for a_list, url in zip(issues_a, volumes_dframe.url) 
-   for aTag in a_list])
+issues_dframe = pd.DataFrame([record for a_list in issues_a for record in a_list])
 # (315, 7)
 # issues_dframe.loc[:, ['path', 'string']]
 #                                             path             string
@@ -166,26 +173,24 @@ issues_repeated = {
 # pickle.dump(issues_dframe, open("issues_dframe.pkl", "wb"))
 
 # issues_dframe.to_excel('eid-issues_dframe.xlsx', engine='openpyxl', freeze_panes=(1,0))
-issues_html = [get_html_from_url(url, print_url=False, timeout=1) 
-               for url in tqdm(issues_dframe.url)]
+frontier_save(crawl_db, 'issue', issues_dframe)
+# issues_html = [get_html_from_url(url, print_url=False, timeout=1) 
+#                for url in tqdm(issues_dframe.url)]
 # 315/315 [02:38<00:00,  1.99it/s]
 # sum([len(x)==0 for x in issues_html]) # 32
-# no_html = [idx for idx, html in enumerate(issues_html) if len(html) == 0]
-# check for failed requests -- those with length 0; repeat until there are none
-for iss in tqdm(range(315)):
-   if issues_html[iss] == '':
-      issues_html[iss] = get_html_from_url(issues_dframe.url[iss], print_url=True, timeout=5)
+# issue pages already retrieved are read from frontier, not requested again
+issues_html = frontier_fetch(crawl_db, 'issue', issues_dframe.url)
+# transient failures are retried with backoff; pages that still fail (length 0)
+# are requested again by re-running frontier_fetch
 # sum([len(x)==0 for x in issues_html]) # 0
 
 # [len(x) for x in issues_html]
 # [478627, 474856, 396141, 475403, 476158, 481383, 469056, 479126, 469057, ...]
-issues_soup = [BeautifulSoup(html, 'lxml') for html in tqdm(issues_html)] #, total=315
+# issues_soup = [BeautifulSoup(html, 'lxml') for html in tqdm(issues_html)] #, total=315
 # 315/315 [00:30<00:00, 10.46it/s]
 
 # review all anchor-refs from issue URLs
-# pd.DataFrame([process_aTag(aTag, url) 
-#     for soup, url in zip(issues_soup, issues_dframe.url) 
-#     for aTag in soup.find_all('a', href=True)])\
+# anchors_dframe(issues_html, issues_dframe.url)\
 #     .to_excel('eid-issues-anchors.xlsx', engine='openpyxl', freeze_panes=(1,0))
 # [77593 rows x 7 columns]
 
@@ -198,12 +203,12 @@ issues_soup = [BeautifulSoup(html, 'lxml') for html in tqdm(issues_html)] #, tot
 # Most paths (13625) follow pattern '/\d{1,2}/\d{1,2}/\d{2}-\d{4}_article'
 
 eid_art_re = re.compile(r'_article$')
-articles_a = [soup.find_all('a', href=eid_art_re) for soup in issues_soup]
+# articles_a = [soup.find_all('a', href=eid_art_re) for soup in issues_soup]
+articles_a = [extract_anchors(html, url, href=eid_art_re)
+              for html, url in zip(tqdm(issues_html), issues_dframe.url)]
 articles_a_n = [len(x) for x in articles_a] # sum(articles_a_n) # 13625
 
-articles_dframe = pd.DataFrame([process_aTag(aTag, url) 
-   for a_list, url in zip(articles_a, issues_dframe.url) 
-   for aTag in a_list])
+articles_dframe = pd.DataFrame([record for a_list in articles_a for record in a_list])
 # (13625, 7)
 # with pd.option_context("display.max_colwidth", 35):
 #     display(articles_dframe.loc[:, ['path', 'string']])
@@ -224,6 +229,17 @@ articles_dframe = pd.DataFrame([process_aTag(aTag, url)
 # all these are "about the cover", which are linked twice each
 articles_dframe = articles_dframe.loc[articles_dframe['string'] != ''].reset_index(drop=True)
 # (13310, 7)
+frontier_save(crawl_db, 'article', articles_dframe)
+
+#%% 4 (alternative). Candidate articles from sitemaps
+# Sitemaps listed in robots.txt (where the site publishes them) enumerate
+# article URLs, with last-modified dates, in a few requests instead of one
+# per table of contents; filter them with eid_art_re and reconcile with the
+# TOC crawl above, which then serves to verify.
+# eid_sitemap_df = sitemap_articles('https://wwwnc.cdc.gov/eid/', eid_art_re, articles_dframe)
+# eid_sitemap_df.found.value_counts() # both, sitemap (only), toc (only)
+# eid_sitemap_df.loc[eid_sitemap_df.found == 'sitemap']\
+#     .to_excel('eid-sitemap-only.xlsx', engine='openpyxl', freeze_panes=(1,0))
 
 #%% 5. Complete list of EID files
 eid_cc_df = pd.concat([
@@ -255,18 +271,70 @@ x = create_mirror_tree(EID_BASE_PATH_b0, calculate_mirror_dirs(eid_cc_df.path))
 vol_29_30 = (eid_cc_df.url.str.contains('/(29|30)/') | 
              eid_cc_df.url.str.contains('volume-(29|30)'))
 eid_cc_df_ = eid_cc_df.loc[vol_29_30, :]
-eid_sizes_b0 = [
-    mirror_raw_html(url, EID_BASE_PATH_b0 + path, print_url = False, timeout = 8)
-    for url, path in tqdm(zip(eid_cc_df_.url, eid_cc_df_.mirror_path),
-                          total=len(eid_cc_df_.mirror_path))]
-# sum([x==0 for x in eid_sizes_b0]) # retry those with 0 length
-for j in len(eid_cc_df.mirror_path):
-   if eid_sizes_b0[j] == 0:
-      eid_sizes_b0[j] = mirror_raw_html(eid_cc_df.url[j], 
-         EID_BASE_PATH_b0 + eid_cc_df.mirror_path[j], timeout=5)
+# eid_sizes_b0 = [
+#     mirror_raw_html(url, EID_BASE_PATH_b0 + path, print_url = False, timeout = 8)
+#     for url, path in tqdm(zip(eid_cc_df_.url, eid_cc_df_.mirror_path),
+#                           total=len(eid_cc_df_.mirror_path))]
+# manifest of files already mirrored, so that a refresh rewrites only new or
+# changed files; seed it once from the published list of mirrored files
+# eid_manifest = seed_mirror_manifest(
+#     eid_cc_df, 'csv-output/cdc_mirror_list_1982-2024.csv')
+eid_manifest = load_mirror_manifest('eid_manifest.json')
+# final URLs of redirected requests, requested directly on later runs
+load_redirect_map('eid_redirects.json')
+# content digests, so that byte-identical files are stored once and flagged
+eid_content = load_content_index('eid_content.json')
+
+eid_sizes_b0 = mirror_raw_html_pool(
+    eid_cc_df_.url, eid_cc_df_.mirror_path, EID_BASE_PATH_b0,
+    manifest=eid_manifest, dedup=eid_content)
+save_mirror_manifest(eid_manifest, 'eid_manifest.json')
+save_redirect_map('eid_redirects.json')
+save_content_index(eid_content, 'eid_content.json')
+
+# documents reachable under more than one URL, flagged as they were mirrored
+# (each duplicate is a hard link to the first file with the same content)
+eid_dupes = content_dupes(eid_content, EID_BASE_PATH_b0)
+# eid_cc_df.loc[eid_cc_df.mirror_path.isin(eid_dupes.mirror_path)]
+
+# alternatively, backfill only files missing from the published mirror list
+# (or whose local copy differs in size from it), rather than re-crawling
+# eid_gaps = find_mirror_gaps(
+#     eid_cc_df, 'csv-output/cdc_mirror_list_1982-2024.csv', EID_BASE_PATH_b0)
+# eid_gaps.gap.value_counts()
+# eid_sizes_gaps = mirror_raw_html_pool(
+#     eid_gaps.url, eid_gaps.mirror_path, EID_BASE_PATH_b0,
+#     manifest=eid_manifest)
+
+# alternatively, mirror straight into a single zip archive, without a tree of
+# separate files, and list its contents as in csv-output/
+# recover_mirror_archive('eid_2024.zip') # only if an earlier run was interrupted
+# eid_archive = open_mirror_archive('eid_2024.zip')
+# eid_sizes_b0 = mirror_raw_html_pool(
+#     eid_cc_df_.url, eid_cc_df_.mirror_path,
+#     manifest=eid_manifest, archive=eid_archive)
+# close_mirror_archive(eid_archive)
+# mirror_archive_list('eid_2024.zip', 'eid')\
+#     .to_csv('cdc_mirror_list_eid_2024.csv', index=False)
+# transient failures are retried with backoff; files that still fail have
+# size 0 and are not written
+# sum([x==0 for x in eid_sizes_b0]) # 0
 # pickle.dump(eid_sizes_b0, open('eid_sizes_b0.pkl', 'wb'))
 eid_sizes_b0 = pickle.load(open("eid_sizes_b0.pkl", "rb"))
 
+#%% 3-5 (alternative). Pipelined crawl of issues and articles
+# Rather than retrieving all issue pages, then parsing all of them, then
+# mirroring all articles, mirror each issue's articles as soon as its page
+# has been retrieved and parsed. Requires issues_dframe (section 3) and a
+# mirror tree for all volumes (section 5).
+# def eid_issue_articles(html, url):
+#    return [record for record in extract_anchors(html, url, href=eid_art_re)
+#            if record['string'] != ''] # omit "about the cover"
+#
+# issues_html, articles_dframe = crawl_pipeline(
+#    issues_dframe.url, eid_issue_articles, EID_BASE_PATH_b0)
+# articles_dframe.loc[articles_dframe['size'] == 0] # not retrieved
+
 #%% 6. Routine for reading all files into a single list
 eid_html_b0 = [read_raw_html(EID_BASE_PATH_b0 + path)
                for path in tqdm(eid_cc_df_.mirror_path)]
@@ -21,6 +21,12 @@ Main product: mmwr_cc_df
 # os.chdir('/Users/cmheilig/cdc-corpora/_test')
 os.chdir(r'C:\Temp\mmwr_2024')
 
+# crawl frontier: anchors and pages retrieved so far, so that a restart resumes
+crawl_db = open_crawl_frontier('mmwr_frontier.sqlite')
+# HTTP cache for pages retrieved with get_html_from_url, so that re-running
+# discovery cells during development makes no requests (min_ttl in seconds)
+# http_cache('mmwr_http_cache.sqlite', min_ttl=24*60*60)
+
 #%% 0. Start with MMWR home https://www.cdc.gov/mmwr/about.html
 base_url = 'https://www.cdc.gov/mmwr/about.html'
 home_a = BeautifulSoup(get_html_from_url(base_url), 'lxml')\
@@ -65,7 +71,9 @@ series_dframe = pd.DataFrame(
 # 2  /mmwr/mmwr_ss/ss_pvol.html  Past Volumes (1983-2022)
 # 3    /mmwr/mmwr_su/index.html  Past Volumes (1985-2023)
 
-series_html = [get_html_from_url_(url) for url in series_dframe.url] # list of 4
+frontier_save(crawl_db, 'series', series_dframe)
+# series_html = [get_html_from_url_(url) for url in series_dframe.url] # list of 4
+series_html = frontier_fetch(crawl_db, 'series', series_dframe.url) # list of 4
 # [len(x) for x in series_html]
 # [184781, 184778, 185484, 182764]
 series_soup = [BeautifulSoup(html, 'lxml') for html in tqdm(series_html)]
@@ -139,20 +147,22 @@ volumes_dframe.loc[volumes_dframe.path.duplicated(keep = False) |
                    volumes_dframe.path.str.contains('2025')].index # []
 
 volumes_dframe.reset_index(inplace=True, drop=True) # (131, 7)
+frontier_save(crawl_db, 'volume', volumes_dframe)
+# on restart, reviewed volumes are available without repeating the review
+# volumes_dframe = frontier_load(crawl_db, 'volume')
 
-volumes_html = [get_html_from_url(url) for url in tqdm(volumes_dframe.url)] # list of 135
+# volumes_html = [get_html_from_url(url) for url in tqdm(volumes_dframe.url)] # list of 135
+volumes_html = frontier_fetch(crawl_db, 'volume', volumes_dframe.url) # list of 135
 # 135/135 [00:31<00:00,  4.24it/s]
 # [len(x) for x in volumes_html]
 # [162142, 168102, 177514, 184091, 156674, 166531, 186779, 188210, 182435, ...]
-volumes_soup = [BeautifulSoup(html, 'lxml') for html in tqdm(volumes_html)]
+# volumes_soup = [BeautifulSoup(html, 'lxml') for html in tqdm(volumes_html)]
 # 135/135 [00:03<00:00, 39.47it/s]
 
 # review all anchor-hrefs from volumes URLs
 # [len(soup.find_all('a', href=True)) for soup in volumes_soup]
 # [[495, 518, 580, 629, 499, 564, 711, 726, 671, 722, ...] # len 131, sum 32686
-# pd.DataFrame([process_aTag(aTag, url) 
-#     for soup, url in zip(volumes_soup, volumes_dframe.url) 
-#     for aTag in soup.find_all('a', href=True)])\
+# anchors_dframe(volumes_html, volumes_dframe.url)\
 #     .to_excel('mmwr-volumes-anchors.xlsx', engine='openpyxl', freeze_panes=(1,0))
 # [32686 rows x 7 columns]
 
@@ -161,14 +171,15 @@ volumes_soup = [BeautifulSoup(html, 'lxml') for html in tqdm(volumes_html)]
 # Review of anchor elements in volumes page, mmwr-volumes-anchors.xlsx
 # all article URLs contain /preview/mmwrhtml/ or /volumes/ and end with .htm
 mmwr_art_re0 = re.compile(r'(mmwrhtml|volumes)/(\w|-|/)+.html?')
-articles_a = [soup.find_all('a', href=mmwr_art_re0) for soup in tqdm(volumes_soup)]
+# articles_a = [soup.find_all('a', href=mmwr_art_re0) for soup in tqdm(volumes_soup)]
+# extract anchor records directly, without constructing soups
+articles_a = [extract_anchors(html, url, href=mmwr_art_re0)
+              for html, url in zip(tqdm(volumes_html), volumes_dframe.url)]
 articles_a_n = [len(x) for x in articles_a]
 # sum(articles_a_n) # 15171
 # reorganize 131 nested lists as a single list of 15171
 
-articles_dframe = pd.DataFrame([process_aTag(aTag, url) 
-   for a_list, url in zip(articles_a, volumes_dframe.url)
-   for aTag in a_list])
+articles_dframe = pd.DataFrame([record for a_list in articles_a for record in a_list])
 # with pd.option_context("display.max_colwidth", 36):
 #     display(articles_dframe.loc[:, ['path', 'string']])
 #                                       path                               string
@@ -202,8 +213,19 @@ articles_dframe = articles_dframe.drop(
 
 # articles_dframe.loc[articles_dframe.path.duplicated(keep = False)].index # []
 articles_dframe.reset_index(inplace=True, drop=True)
+frontier_save(crawl_db, 'article', articles_dframe)
 
 
+#%% 3 (alternative). Candidate articles from sitemaps
+# Sitemaps listed in robots.txt (where the site publishes them) enumerate
+# article URLs, with last-modified dates, in a few requests instead of one
+# per table of contents; filter them with mmwr_art_re0 and reconcile with the
+# TOC crawl above, which then serves to verify.
+# mmwr_sitemap_df = sitemap_articles('https://www.cdc.gov/mmwr/', mmwr_art_re0, articles_dframe)
+# mmwr_sitemap_df.found.value_counts() # both, sitemap (only), toc (only)
+# mmwr_sitemap_df.loc[mmwr_sitemap_df.found == 'sitemap']\
+#     .to_excel('mmwr-sitemap-only.xlsx', engine='openpyxl', freeze_panes=(1,0))
+
 #%% 4. Complete list of MMWR HTML files
 mmwr_cc_df = pd.concat([
    home_dframe.assign(level='home'),
@@ -239,17 +261,56 @@ x = create_mirror_tree(MMWR_BASE_PATH_b0, calculate_mirror_dirs(mmwr_cc_df_.path
 # { key: (0 if val is None else len(val)) for (key, val) in x.items() }
 # {'base_path': 1, 'paths': 13, 'norm_paths': 13}
 
-mmwr_sizes_b0 = [
-    mirror_raw_html(url, MMWR_BASE_PATH_b0 + path, print_url = False)
-    for url, path in tqdm(zip(mmwr_cc_df_.url, mmwr_cc_df_.mirror_path), 
-                          total=len(mmwr_cc_df_.mirror_path))]
+# mmwr_sizes_b0 = [
+#     mirror_raw_html(url, MMWR_BASE_PATH_b0 + path, print_url = False)
+#     for url, path in tqdm(zip(mmwr_cc_df_.url, mmwr_cc_df_.mirror_path), 
+#                           total=len(mmwr_cc_df_.mirror_path))]
 # 628/628 [02:45<00:00,  3.79it/s]
-
-# sum([x==0 for x in mmwr_sizes_b0]) # retry those with 0 length
-for j in tqdm(range(len(mmwr_sizes_b0))):
-   if mmwr_sizes_b0[j] == '':
-      mmwr_sizes_b0[j] = mirror_raw_html(mmwr_cc_df_.url.loc[j], 
-         MMWR_BASE_PATH_b0 + mmwr_cc_df_.mirror_path.loc[j], timeout=5)
+# manifest of files already mirrored, so that a refresh rewrites only new or
+# changed files; seed it once from the published list of mirrored files
+# mmwr_manifest = seed_mirror_manifest(
+#     mmwr_cc_df, 'csv-output/cdc_mirror_list_1982-2024.csv')
+mmwr_manifest = load_mirror_manifest('mmwr_manifest.json')
+# final URLs of redirected requests, requested directly on later runs
+load_redirect_map('mmwr_redirects.json')
+# content digests, so that byte-identical files are stored once and flagged
+mmwr_content = load_content_index('mmwr_content.json')
+
+mmwr_sizes_b0 = mirror_raw_html_pool(
+    mmwr_cc_df_.url, mmwr_cc_df_.mirror_path, MMWR_BASE_PATH_b0,
+    manifest=mmwr_manifest, dedup=mmwr_content)
+save_mirror_manifest(mmwr_manifest, 'mmwr_manifest.json')
+save_redirect_map('mmwr_redirects.json')
+save_content_index(mmwr_content, 'mmwr_content.json')
+
+# documents reachable under more than one URL, flagged as they were mirrored
+# (each duplicate is a hard link to the first file with the same content)
+mmwr_dupes = content_dupes(mmwr_content, MMWR_BASE_PATH_b0)
+# mmwr_cc_df.loc[mmwr_cc_df.mirror_path.isin(mmwr_dupes.mirror_path)]
+
+# alternatively, backfill only files missing from the published mirror list
+# (or whose local copy differs in size from it), rather than re-crawling
+# mmwr_gaps = find_mirror_gaps(
+#     mmwr_cc_df, 'csv-output/cdc_mirror_list_1982-2024.csv', MMWR_BASE_PATH_b0)
+# mmwr_gaps.gap.value_counts()
+# mmwr_sizes_gaps = mirror_raw_html_pool(
+#     mmwr_gaps.url, mmwr_gaps.mirror_path, MMWR_BASE_PATH_b0,
+#     manifest=mmwr_manifest)
+
+# alternatively, mirror straight into a single zip archive, without a tree of
+# separate files, and list its contents as in csv-output/
+# recover_mirror_archive('mmwr_2024.zip') # only if an earlier run was interrupted
+# mmwr_archive = open_mirror_archive('mmwr_2024.zip')
+# mmwr_sizes_b0 = mirror_raw_html_pool(
+#     mmwr_cc_df_.url, mmwr_cc_df_.mirror_path,
+#     manifest=mmwr_manifest, archive=mmwr_archive)
+# close_mirror_archive(mmwr_archive)
+# mirror_archive_list('mmwr_2024.zip', 'mmwr')\
+#     .to_csv('cdc_mirror_list_mmwr_2024.csv', index=False)
+
+# transient failures are retried with backoff; files that still fail have
+# size 0 and are not written
+# sum([x==0 for x in mmwr_sizes_b0]) # 0
 # pickle.dump(mmwr_sizes_b0, open('mmwr_sizes_b0.pkl', 'wb'))
 
 #%% 6. Routine for reading all files into a single list
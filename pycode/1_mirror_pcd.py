@@ -21,6 +21,12 @@ Main product: pcd_cc_df
 # os.chdir('/Users/cmheilig/cdc-corpora/_test')
 os.chdir(r'C:\Temp\pcd_2024')
 
+# crawl frontier: anchors and pages retrieved so far, so that a restart resumes
+crawl_db = open_crawl_frontier('pcd_frontier.sqlite')
+# HTTP cache for pages retrieved with get_html_from_url, so that re-running
+# discovery cells during development makes no requests (min_ttl in seconds)
+# http_cache('pcd_http_cache.sqlite', min_ttl=24*60*60)
+
 
 #%% 0. Start with PCD home https://www.cdc.gov/pcd/index.htm
 base_url = 'https://www.cdc.gov/pcd/index.htm'
@@ -83,7 +89,9 @@ series_dframe = pd.DataFrame(
 # 0  /pcd/issues/archive.htm                  Issue Archive
 # 1   /pcd/es/archive_es.htm  Archivo de números en español
 
-series_html = [get_html_from_url(url) for url in series_dframe.url]
+frontier_save(crawl_db, 'series', series_dframe)
+# series_html = [get_html_from_url(url) for url in series_dframe.url]
+series_html = frontier_fetch(crawl_db, 'series', series_dframe.url)
 # [len(x) for x in series_html] # [105222, 35870]
 series_soup = [BeautifulSoup(html, 'lxml') for html in series_html]
 
@@ -132,16 +140,16 @@ volumes_dframe = pd.DataFrame([process_aTag(aTag, url)
 # 84       /pcd/es/2005_apr_toc.htm      Abril
 # 85       /pcd/es/2005_jan_toc.htm      Enero
 
-volumes_html = [get_html_from_url(url) for url in tqdm(volumes_dframe.url)]
+frontier_save(crawl_db, 'volume', volumes_dframe)
+# volumes_html = [get_html_from_url(url) for url in tqdm(volumes_dframe.url)]
+volumes_html = frontier_fetch(crawl_db, 'volume', volumes_dframe.url)
 # 86/86 [00:14<00:00,  5.94it/s]
 # repr([len(x) for x in volumes_html])
 # [173689, 186517, 161289, 173692, 234046, 227218, 220971, 205798, 426105, ...] 
-volumes_soup = [BeautifulSoup(html, 'lxml') for html in volumes_html]
+# volumes_soup = [BeautifulSoup(html, 'lxml') for html in volumes_html]
 
 # review all anchor-refs from volumes URLs
-# pd.DataFrame([process_aTag(aTag, url) 
-#     for soup, url in zip(volumes_soup, volumes_dframe.url) 
-#     for aTag in soup.find_all('a', href=True)])\
+# anchors_dframe(volumes_html, volumes_dframe.url)\
 #     .to_excel('pcd-volumes-anchors.xlsx', engine='openpyxl', freeze_panes=(1,0))
 # [12111 rows x 7 columns]
 
@@ -160,13 +168,14 @@ volumes_soup = [BeautifulSoup(html, 'lxml') for html in volumes_html]
 # Omitted: memoriam,htm (1), _pt.htm (1), _vi.htm (1)
 
 pcd_art_re = re.compile(r'((\d{2}_\d{4,5}([aber]|_es|_fr|_zhs|_zht)?)|cover).htm')
-articles_a = [soup.find_all('a', href=pcd_art_re) for soup in volumes_soup]
+# articles_a = [soup.find_all('a', href=pcd_art_re) for soup in volumes_soup]
+# extract anchor records directly, without constructing soups
+articles_a = [extract_anchors(html, url, href=pcd_art_re)
+              for html, url in zip(volumes_html, volumes_dframe.url)]
 articles_a_n = [len(x) for x in articles_a] # sum(articles_a_n) # 5882
 # [103, 117, 89, 104, 169, 166, 166, 142, 181, 231, 230, 216, 179, 67, 40, ...]
 
-articles_dframe = pd.DataFrame([process_aTag(aTag, url) 
-   for a_list, url in zip(articles_a, volumes_dframe.url) 
-   for aTag in a_list])
+articles_dframe = pd.DataFrame([record for a_list in articles_a for record in a_list])
 # (5882, 7)
 with pd.option_context("display.max_colwidth", 35):
     display(articles_dframe.loc[:, ['path', 'string']])
@@ -220,10 +229,21 @@ articles_dframe = (
                             articles_dframe['url'].str.endswith('_es.htm') &
                             articles_dframe.path.duplicated(keep = False)].index)
         .reset_index(drop=True) ) # (5194, 7)
+frontier_save(crawl_db, 'article', articles_dframe)
 # articles_dframe.loc[articles_dframe.path.duplicated(keep = False)].index # [865, 879]
 
 articles_dframe.to_excel('pcd-articles_dframe.xlsx', engine='openpyxl', freeze_panes=(1,0))
 
+#%% 3 (alternative). Candidate articles from sitemaps
+# Sitemaps listed in robots.txt (where the site publishes them) enumerate
+# article URLs, with last-modified dates, in a few requests instead of one
+# per table of contents; filter them with pcd_art_re and reconcile with the
+# TOC crawl above, which then serves to verify.
+# pcd_sitemap_df = sitemap_articles('https://www.cdc.gov/pcd/', pcd_art_re, articles_dframe)
+# pcd_sitemap_df.found.value_counts() # both, sitemap (only), toc (only)
+# pcd_sitemap_df.loc[pcd_sitemap_df.found == 'sitemap']\
+#     .to_excel('pcd-sitemap-only.xlsx', engine='openpyxl', freeze_panes=(1,0))
+
 #%% 4. Complete list of PCD files
 pcd_cc_df = pd.concat([
    home_dframe.assign(level='home'),
@@ -254,17 +274,55 @@ x = create_mirror_tree(PCD_BASE_PATH_b0, calculate_mirror_dirs(pcd_cc_df_.path))
 # { key: (0 if val is None else len(val)) for (key, val) in x.items() }
 # {'base_path': 1, 'paths': 2, 'norm_paths': 2}
 
-pcd_sizes_b0 = [
-    mirror_raw_html(url, PCD_BASE_PATH_b0 + path, print_url = False)
-    for url, path in tqdm(zip(pcd_cc_df_.url, pcd_cc_df_.mirror_path),
-                          total=len(pcd_cc_df_.mirror_path))]
+# pcd_sizes_b0 = [
+#     mirror_raw_html(url, PCD_BASE_PATH_b0 + path, print_url = False)
+#     for url, path in tqdm(zip(pcd_cc_df_.url, pcd_cc_df_.mirror_path),
+#                           total=len(pcd_cc_df_.mirror_path))]
 # 222/222 [01:01<00:00,  3.61it/s]
-# sum([x==0 for x in pcd_sizes_b0]) # retry those with 0 length
-for j in range(len(pcd_sizes_b0)):
-   if pcd_sizes_b0[j] == 0:
-      pcd_sizes_b0[j] = mirror_raw_html(pcd_cc_df.url[j], 
-         PCD_BASE_PATH_b0 + pcd_cc_df.mirror_path[j], timeout=5)
-# sum([x==0 for x in pcd_sizes_b0]) # retry those with 0 length
+# manifest of files already mirrored, so that a refresh rewrites only new or
+# changed files; seed it once from the published list of mirrored files
+# pcd_manifest = seed_mirror_manifest(
+#     pcd_cc_df, 'csv-output/cdc_mirror_list_1982-2024.csv')
+pcd_manifest = load_mirror_manifest('pcd_manifest.json')
+# final URLs of redirected requests, requested directly on later runs
+load_redirect_map('pcd_redirects.json')
+# content digests, so that byte-identical files are stored once and flagged
+pcd_content = load_content_index('pcd_content.json')
+
+pcd_sizes_b0 = mirror_raw_html_pool(
+    pcd_cc_df_.url, pcd_cc_df_.mirror_path, PCD_BASE_PATH_b0,
+    manifest=pcd_manifest, dedup=pcd_content)
+save_mirror_manifest(pcd_manifest, 'pcd_manifest.json')
+save_redirect_map('pcd_redirects.json')
+save_content_index(pcd_content, 'pcd_content.json')
+
+# documents reachable under more than one URL, flagged as they were mirrored
+# (each duplicate is a hard link to the first file with the same content)
+pcd_dupes = content_dupes(pcd_content, PCD_BASE_PATH_b0)
+# pcd_cc_df.loc[pcd_cc_df.mirror_path.isin(pcd_dupes.mirror_path)]
+
+# alternatively, backfill only files missing from the published mirror list
+# (or whose local copy differs in size from it), rather than re-crawling
+# pcd_gaps = find_mirror_gaps(
+#     pcd_cc_df, 'csv-output/cdc_mirror_list_1982-2024.csv', PCD_BASE_PATH_b0)
+# pcd_gaps.gap.value_counts()
+# pcd_sizes_gaps = mirror_raw_html_pool(
+#     pcd_gaps.url, pcd_gaps.mirror_path, PCD_BASE_PATH_b0,
+#     manifest=pcd_manifest)
+
+# alternatively, mirror straight into a single zip archive, without a tree of
+# separate files, and list its contents as in csv-output/
+# recover_mirror_archive('pcd_2024.zip') # only if an earlier run was interrupted
+# pcd_archive = open_mirror_archive('pcd_2024.zip')
+# pcd_sizes_b0 = mirror_raw_html_pool(
+#     pcd_cc_df_.url, pcd_cc_df_.mirror_path,
+#     manifest=pcd_manifest, archive=pcd_archive)
+# close_mirror_archive(pcd_archive)
+# mirror_archive_list('pcd_2024.zip', 'pcd')\
+#     .to_csv('cdc_mirror_list_pcd_2024.csv', index=False)
+# transient failures are retried with backoff; files that still fail have
+# size 0 and are not written
+# sum([x==0 for x in pcd_sizes_b0]) # 0
 
 # pickle.dump(pcd_sizes_b0, open('pcd_sizes_b0.pkl', 'wb'))
 
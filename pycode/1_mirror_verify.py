@@ -0,0 +1,38 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Verify a local mirror, or zipped mirror archives, against the mirror lists
+
+@author: cmheilig
+
+Sections of this script:
+0. Set up environment
+1. Verify mirror tree (e.g., ~/cdc-corpora) against 1982-2024 list
+2. Verify zipped archives (e.g., html-mirrors/*.zip) against 2024 list
+
+Main product: verify_df (status of each listed file)
+"""
+
+#%% 0. Set up environment
+# import from 0_cdc-corpora-header.py
+from glob import glob
+
+# os.chdir('/Users/cmheilig/cdc-corpora/_test')
+os.chdir(r'C:\Temp\verify_2024')
+
+CDC_BASE_PATH_b0 = normpath(expanduser('~/cdc-corpora'))
+
+#%% 1. Verify mirror tree against 1982-2024 list
+verify_df = verify_mirror('csv-output/cdc_mirror_list_1982-2024.csv',
+                          base_path=CDC_BASE_PATH_b0, max_workers=8)
+verify_df.status.value_counts()
+pd.crosstab(verify_df.Series, verify_df.status, margins=True)
+# files to retrieve again, e.g., with mirror_raw_html_pool after matching 
+# Name to '/' + *_cc_df.mirror_path (see find_mirror_gaps)
+verify_df.loc[verify_df.status != 'ok']\
+   .to_csv('cdc_mirror_verify_1982-2024.csv', index=False)
+
+#%% 2. Verify zipped archives against 2024 list
+verify_zip_df = verify_mirror('csv-output/cdc_mirror_list_2024.csv',
+                              zip_paths=glob('html-mirrors/*_2024.zip'))
+verify_zip_df.status.value_counts()
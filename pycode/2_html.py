@@ -8,20 +8,22 @@ Preprocess raw HTML before focusing on metadata and content
 0. Set up environment
 1. Retrieve mirror structure DataFrames *_cc_df
 2. Read raw HTML files into dictionary objects {mmwr,eid,pcd}_{toc,raw}_raw
-   2a,2b Pickle/unpickle *_*_raw
+   (or straight from zipped mirror archives, html-mirrors/*.zip)
+   2a,2b Store/retrieve *_*_raw (DocStore, formerly pickles)
 3. Resolve character sets (e.g., win-1252) and exceptions resulting from decoding
 4. Resolve character and numeric entitity references {mmwr,eid,pcd}_{toc,raw}_uni
    "Unescape" HTML as Unicode text (UTF-8) and reduce space-like characters
    Resolve ad hoc errors, such as multiple </body> tags
-   4a,4b Pickle/unpickle *_*_uni
+   4a,4b Store/retrieve *_*_uni
 5. Reduce space by trimming <svg> elements {mmwr,eid,pcd}_{toc,raw}_unx
-   5a,5b Pickle/unpickle *_*_unx
+   5a,5b Store/retrieve *_*_unx
 """
 
 #%% 0. Set up environment
 from collections import Counter
 import html
 import unicodedata
+from glob import glob
 os.chdir('/Users/cmheilig/cdc-corpora/_test')
 
 #%% 1. Retrieve mirror structure DataFrames
@@ -85,21 +87,64 @@ pcd_art_raw = {
                                     'mirror_path'].sort_values()) } # 5194
 
 
-#%% 2a. Pickle dictionaries of raw HTML files
-pickle.dump(mmwr_toc_raw, open('mmwr_toc_raw.pkl', 'xb'))
-pickle.dump(mmwr_art_raw, open('mmwr_art_raw.pkl', 'xb'))
-pickle.dump(eid_toc_raw, open('eid_toc_raw.pkl', 'xb'))
-pickle.dump(eid_art_raw, open('eid_art_raw.pkl', 'xb'))
-pickle.dump(pcd_toc_raw, open('pcd_toc_raw.pkl', 'xb'))
-pickle.dump(pcd_art_raw, open('pcd_art_raw.pkl', 'xb'))
-
-#%% 2b. Unpickle dictionaries of raw HTML files
-mmwr_toc_raw = pickle.load(open('pickle-files/mmwr_toc_raw.pkl', 'rb'))
-mmwr_art_raw = pickle.load(open('pickle-files/mmwr_art_raw.pkl', 'rb'))
-eid_toc_raw = pickle.load(open('pickle-files/eid_toc_raw.pkl', 'rb'))
-eid_art_raw = pickle.load(open('pickle-files/eid_art_raw.pkl', 'rb'))
-pcd_toc_raw = pickle.load(open('pickle-files/pcd_toc_raw.pkl', 'rb'))
-pcd_art_raw = pickle.load(open('pickle-files/pcd_art_raw.pkl', 'rb'))
+#%% 2 (alternative). Read raw HTML straight from zipped mirror archives
+# as distributed in html-mirrors/, without extracting files to disk first;
+# later archives (e.g., *_2024.zip) supersede earlier ones
+# mmwr_zips = sorted(glob('html-mirrors/mmwr_*.zip'))
+# eid_zips = sorted(glob('html-mirrors/eid_*.zip'))
+# pcd_zips = sorted(glob('html-mirrors/pcd_*.zip'))
+#
+# mmwr_toc_raw = dict(iter_zip_html(mmwr_zips, tqdm(
+#     mmwr_cc_df.loc[mmwr_cc_df.level.isin(['series', 'volume']), 
+#                    'mirror_path'].sort_values()))) # 139
+# mmwr_art_raw = dict(iter_zip_html(mmwr_zips, tqdm(
+#     mmwr_cc_df.loc[mmwr_cc_df.level == 'article', 
+#                    'mirror_path'].sort_values()))) # 15435
+#
+# eid_toc_raw = dict(iter_zip_html(eid_zips, tqdm(
+#     eid_cc_df.loc[eid_cc_df.level.isin(['volume', 'issue']), 
+#                   'mirror_path'].sort_values()))) # 345
+# eid_art_raw = dict(iter_zip_html(eid_zips, tqdm(
+#     eid_cc_df.loc[eid_cc_df.level == 'article', 
+#                   'mirror_path'].sort_values()))) # 13310
+#
+# pcd_toc_raw = dict(iter_zip_html(pcd_zips, tqdm(
+#     pcd_cc_df.loc[pcd_cc_df.level.isin(['series', 'volume']), 
+#                   'mirror_path'].sort_values()))) # 88
+# pcd_art_raw = dict(iter_zip_html(pcd_zips, tqdm(
+#     pcd_cc_df.loc[pcd_cc_df.level == 'article', 
+#                   'mirror_path'].sort_values()))) # 5194
+
+#%% 2a. Store dictionaries of raw HTML files
+# pickle.dump(mmwr_toc_raw, open('mmwr_toc_raw.pkl', 'xb'))
+# pickle.dump(mmwr_art_raw, open('mmwr_art_raw.pkl', 'xb'))
+# pickle.dump(eid_toc_raw, open('eid_toc_raw.pkl', 'xb'))
+# pickle.dump(eid_art_raw, open('eid_art_raw.pkl', 'xb'))
+# pickle.dump(pcd_toc_raw, open('pcd_toc_raw.pkl', 'xb'))
+# pickle.dump(pcd_art_raw, open('pcd_art_raw.pkl', 'xb'))
+# one content-addressed store for all collections and variants, from which
+# later scripts read only the documents they need
+DocStore('cdc_docs.sqlite', 'mmwr_toc', 'raw').update(mmwr_toc_raw)
+DocStore('cdc_docs.sqlite', 'mmwr_art', 'raw').update(mmwr_art_raw)
+DocStore('cdc_docs.sqlite', 'eid_toc', 'raw').update(eid_toc_raw)
+DocStore('cdc_docs.sqlite', 'eid_art', 'raw').update(eid_art_raw)
+DocStore('cdc_docs.sqlite', 'pcd_toc', 'raw').update(pcd_toc_raw)
+DocStore('cdc_docs.sqlite', 'pcd_art', 'raw').update(pcd_art_raw)
+
+#%% 2b. Retrieve dictionaries of raw HTML files
+# mmwr_toc_raw = pickle.load(open('pickle-files/mmwr_toc_raw.pkl', 'rb'))
+# mmwr_art_raw = pickle.load(open('pickle-files/mmwr_art_raw.pkl', 'rb'))
+# eid_toc_raw = pickle.load(open('pickle-files/eid_toc_raw.pkl', 'rb'))
+# eid_art_raw = pickle.load(open('pickle-files/eid_art_raw.pkl', 'rb'))
+# pcd_toc_raw = pickle.load(open('pickle-files/pcd_toc_raw.pkl', 'rb'))
+# pcd_art_raw = pickle.load(open('pickle-files/pcd_art_raw.pkl', 'rb'))
+# read into memory (dict), as section 3 corrects some documents in place
+mmwr_toc_raw = dict(DocStore('pickle-files/cdc_docs.sqlite', 'mmwr_toc', 'raw').items())
+mmwr_art_raw = dict(DocStore('pickle-files/cdc_docs.sqlite', 'mmwr_art', 'raw').items())
+eid_toc_raw = dict(DocStore('pickle-files/cdc_docs.sqlite', 'eid_toc', 'raw').items())
+eid_art_raw = dict(DocStore('pickle-files/cdc_docs.sqlite', 'eid_art', 'raw').items())
+pcd_toc_raw = dict(DocStore('pickle-files/cdc_docs.sqlite', 'pcd_toc', 'raw').items())
+pcd_art_raw = dict(DocStore('pickle-files/cdc_docs.sqlite', 'pcd_art', 'raw').items())
 
 #%% 3. Review and test declared character sets
 
@@ -167,6 +212,20 @@ charset_freqs = _
 sorted(set([y for x in list(charset_freqs) for y in eval(x)]))
 [b'GB2312', b'UTF-8', b'big5', b'iso-8859-1', b'utf-8', b'windows-1252']
 
+## Declared charsets that determine each document's codec (see 
+# sniff_charset_b); 'none' is decoded as windows-1252
+charset_rules = {
+    f'{ser}_{lev}': Counter([sniff_charset_b(html_b)[1]
+                             for html_b in eval(f'{ser}_{lev}_raw').values()])
+    for ser in ['mmwr', 'eid', 'pcd']
+    for lev in ['toc', 'art']}
+pd.DataFrame(charset_rules).fillna(0).astype(int)
+# documents with declarations beyond the searched prefix (expect 0)
+sum([sniff_charset_b(html_b) != sniff_charset_b(html_b, prefix=None)
+     for ser in ['mmwr', 'eid', 'pcd']
+     for lev in ['toc', 'art']
+     for html_b in eval(f'{ser}_{lev}_raw').values()])
+
 
 ## Test declared character sets and undeclared codecs; convert to UTF-8
 # ['ascii', 'windows-1252', 'iso-8859-1', 'utf-8']
@@ -240,25 +299,31 @@ pcd_art_raw['/pcd/issues/2015/15_0187.htm'] = (
 pcd_art_raw['/pcd/issues/2017/17_0013.htm'] = (
     pcd_art_raw['/pcd/issues/2017/17_0013.htm'].replace(b'\xc2\x80\x99', b'\xe2\x80\x99'))
 
-# Convert to UTF-8
-mmwr_toc_uni = {
-    path: html_to_unicode_b(html_b, try_=False)
-    for path, html_b in tqdm(mmwr_toc_raw.items())}
-mmwr_art_uni = {
-    path: html_to_unicode_b(html_b, try_=False)
-    for path, html_b in tqdm(mmwr_art_raw.items())}
-eid_toc_uni = {
-    path: html_to_unicode_b(html_b, try_=False)
-    for path, html_b in tqdm(eid_toc_raw.items())}
-eid_art_uni = {
-    path: html_to_unicode_b(html_b, try_=False)
-    for path, html_b in tqdm(eid_art_raw.items())}
-pcd_toc_uni = {
-    path: html_to_unicode_b(html_b, try_=False)
-    for path, html_b in tqdm(pcd_toc_raw.items())}
-pcd_art_uni = {
-    path: html_to_unicode_b(html_b, try_=False)
-    for path, html_b in tqdm(pcd_art_raw.items())}
+# Convert to UTF-8, in parallel processes (see map_docs)
+# mmwr_toc_uni = {
+#     path: html_to_unicode_b(html_b, try_=False)
+#     for path, html_b in tqdm(mmwr_toc_raw.items())}
+mmwr_toc_uni = map_docs(html_to_unicode_b, mmwr_toc_raw, try_=False)
+# mmwr_art_uni = {
+#     path: html_to_unicode_b(html_b, try_=False)
+#     for path, html_b in tqdm(mmwr_art_raw.items())}
+mmwr_art_uni = map_docs(html_to_unicode_b, mmwr_art_raw, try_=False)
+# eid_toc_uni = {
+#     path: html_to_unicode_b(html_b, try_=False)
+#     for path, html_b in tqdm(eid_toc_raw.items())}
+eid_toc_uni = map_docs(html_to_unicode_b, eid_toc_raw, try_=False)
+# eid_art_uni = {
+#     path: html_to_unicode_b(html_b, try_=False)
+#     for path, html_b in tqdm(eid_art_raw.items())}
+eid_art_uni = map_docs(html_to_unicode_b, eid_art_raw, try_=False)
+# pcd_toc_uni = {
+#     path: html_to_unicode_b(html_b, try_=False)
+#     for path, html_b in tqdm(pcd_toc_raw.items())}
+pcd_toc_uni = map_docs(html_to_unicode_b, pcd_toc_raw, try_=False)
+# pcd_art_uni = {
+#     path: html_to_unicode_b(html_b, try_=False)
+#     for path, html_b in tqdm(pcd_art_raw.items())}
+pcd_art_uni = map_docs(html_to_unicode_b, pcd_art_raw, try_=False)
 
 Counter([html_b.count(b'\xef\xbb\xbf') for html_b in mmwr_art_raw.values()])
 # Counter({0: 12289, 1: 3145, 60: 1})
@@ -349,51 +414,65 @@ Counter({False: 13310})
 Counter([re.search('<pre[ >]', html, flags=re.I) is not None for html in pcd_art_uni.values()])
 Counter({False: 5193})
 
-def ent_repair(html_u):
-    # &thinsp; is sometimes large-number delimiter
-    if '&thinsp;' in html_u:
-        html_u = re.sub(r'&thinsp;(?=\d{3})', ',', html_u) # comma for thousands
-    # entities to replace or delete; spaces will be converted and reduced
-    html_u = (html_u
-        .replace('&#129;', '&uuml;')  # Cc -> LATIN SMALL LETTER U WITH DIAERESIS
-        .replace('&#157;', '')        # OPERATING SYSTEM COMMAND
-        .replace('&#822;', '&ndash;') # COMBINING LONG STROKE OVERLAY -> EN DASH
-        .replace('&#1467;', '')       # HEBREW POINT QUBUTS
-        .replace('&#1560;', '')       # ARABIC SMALL FATHA
-        .replace('&#8203;', '')       # ZERO WIDTH SPACE
-        .replace('&lrm;', '')         # LEFT-TO-RIGHT MARK
-        .replace('&rlm;', '')         # LEFT-TO-RIGHT MARK
-        .replace('&#8288;', '')       # WORD JOINER
-        .replace('&#8289;', '')       # FUNCTION APPLICATION
-        .replace('&#11834;', '&mdash;') # TWO-EM DASH -> EM DASH
-        .replace('&#61620;', '&times;') # MULTIPLICATION SIGN
-        .replace('&#65533;', ''))     # REPLACEMENT CHARACTER
-    html_u = html.unescape(html_u)
-    return html_u
-
-mmwr_toc_uni = {
-    path: html_reduce_space_u(ent_repair(html_u), minim='<pre[ >]')
-    for path, html_u in tqdm(mmwr_toc_uni.items())}
+# ent_repair and ent_repair_reduce are defined in html_transforms.py (and
+# imported by 0_setup.py), so that map_docs workers can import them
+# def ent_repair(html_u):
+#     # &thinsp; is sometimes large-number delimiter
+#     if '&thinsp;' in html_u:
+#         html_u = re.sub(r'&thinsp;(?=\d{3})', ',', html_u) # comma for thousands
+#     # entities to replace or delete; spaces will be converted and reduced
+#     html_u = (html_u
+#         .replace('&#129;', '&uuml;')  # Cc -> LATIN SMALL LETTER U WITH DIAERESIS
+#         .replace('&#157;', '')        # OPERATING SYSTEM COMMAND
+#         .replace('&#822;', '&ndash;') # COMBINING LONG STROKE OVERLAY -> EN DASH
+#         .replace('&#1467;', '')       # HEBREW POINT QUBUTS
+#         .replace('&#1560;', '')       # ARABIC SMALL FATHA
+#         .replace('&#8203;', '')       # ZERO WIDTH SPACE
+#         .replace('&lrm;', '')         # LEFT-TO-RIGHT MARK
+#         .replace('&rlm;', '')         # LEFT-TO-RIGHT MARK
+#         .replace('&#8288;', '')       # WORD JOINER
+#         .replace('&#8289;', '')       # FUNCTION APPLICATION
+#         .replace('&#11834;', '&mdash;') # TWO-EM DASH -> EM DASH
+#         .replace('&#61620;', '&times;') # MULTIPLICATION SIGN
+#         .replace('&#65533;', ''))     # REPLACEMENT CHARACTER
+#     html_u = html.unescape(html_u)
+#     return html_u
+#
+# def ent_repair_reduce(html_u, minim=None):
+#     return html_reduce_space_u(ent_repair(html_u), minim=minim)
+
+# each document is repaired and reduced independently, so in parallel
+# processes (see map_docs)
+
+# mmwr_toc_uni = {
+#     path: html_reduce_space_u(ent_repair(html_u), minim='<pre[ >]')
+#     for path, html_u in tqdm(mmwr_toc_uni.items())}
+mmwr_toc_uni = map_docs(ent_repair_reduce, mmwr_toc_uni, minim='<pre[ >]')
 # 139/139 [00:00<00:00, 159.60it/s]
-mmwr_art_uni = {
-    path: html_reduce_space_u(ent_repair(html_u), minim='<pre[ >]')
-    for path, html_u in tqdm(mmwr_art_uni.items())}
+# mmwr_art_uni = {
+#     path: html_reduce_space_u(ent_repair(html_u), minim='<pre[ >]')
+#     for path, html_u in tqdm(mmwr_art_uni.items())}
+mmwr_art_uni = map_docs(ent_repair_reduce, mmwr_art_uni, minim='<pre[ >]')
 # 15435/15435 [02:34<00:00, 99.65it/s]
-eid_toc_uni = {
-    path: html_reduce_space_u(ent_repair(html_u))
-    for path, html_u in tqdm(eid_toc_uni.items())}
+# eid_toc_uni = {
+#     path: html_reduce_space_u(ent_repair(html_u))
+#     for path, html_u in tqdm(eid_toc_uni.items())}
+eid_toc_uni = map_docs(ent_repair_reduce, eid_toc_uni)
 # 345/345 [00:10<00:00, 31.62it/s]
-eid_art_uni = {
-    path: html_reduce_space_u(ent_repair(html_u))
-    for path, html_u in tqdm(eid_art_uni.items())}
+# eid_art_uni = {
+#     path: html_reduce_space_u(ent_repair(html_u))
+#     for path, html_u in tqdm(eid_art_uni.items())}
+eid_art_uni = map_docs(ent_repair_reduce, eid_art_uni)
 # 13310/13310 [05:24<00:00, 41.01it/s]
-pcd_toc_uni = {
-    path: html_reduce_space_u(ent_repair(html_u))
-    for path, html_u in tqdm(pcd_toc_uni.items())}
+# pcd_toc_uni = {
+#     path: html_reduce_space_u(ent_repair(html_u))
+#     for path, html_u in tqdm(pcd_toc_uni.items())}
+pcd_toc_uni = map_docs(ent_repair_reduce, pcd_toc_uni)
 # 88/88 [00:00<00:00, 170.11it/s]
-pcd_art_uni = {
-    path: html_reduce_space_u(ent_repair(html_u))
-    for path, html_u in tqdm(pcd_art_uni.items())}
+# pcd_art_uni = {
+#     path: html_reduce_space_u(ent_repair(html_u))
+#     for path, html_u in tqdm(pcd_art_uni.items())}
+pcd_art_uni = map_docs(ent_repair_reduce, pcd_art_uni)
 # 5193/5193 [00:39<00:00, 129.90it/s]
 
 # Ad hoc corrections: 14 MMWRs have extra </body> and </html> tags
@@ -419,21 +498,35 @@ for _path in xtra_tags:
     mmwr_art_uni[_path] = html_u
 del _path, html_u
 
-#%% 4a. Pickle dictionaries of UTF-8 HTML files
-pickle.dump(mmwr_toc_uni, open('mmwr_toc_uni.pkl', 'xb'))
-pickle.dump(mmwr_art_uni, open('mmwr_art_uni.pkl', 'xb'))
-pickle.dump(eid_toc_uni, open('eid_toc_uni.pkl', 'xb'))
-pickle.dump(eid_art_uni, open('eid_art_uni.pkl', 'xb'))
-pickle.dump(pcd_toc_uni, open('pcd_toc_uni.pkl', 'xb'))
-pickle.dump(pcd_art_uni, open('pcd_art_uni.pkl', 'xb'))
-
-#%% 4b. Unpickle dictionaries of UTF-8 HTML files
-mmwr_toc_uni = pickle.load(open('pickle-files/mmwr_toc_uni.pkl', 'rb'))
-mmwr_art_uni = pickle.load(open('pickle-files/mmwr_art_uni.pkl', 'rb'))
-eid_toc_uni = pickle.load(open('pickle-files/eid_toc_uni.pkl', 'rb'))
-eid_art_uni = pickle.load(open('pickle-files/eid_art_uni.pkl', 'rb'))
-pcd_toc_uni = pickle.load(open('pickle-files/pcd_toc_uni.pkl', 'rb'))
-pcd_art_uni = pickle.load(open('pickle-files/pcd_art_uni.pkl', 'rb'))
+#%% 4a. Store dictionaries of UTF-8 HTML files
+# pickle.dump(mmwr_toc_uni, open('mmwr_toc_uni.pkl', 'xb'))
+# pickle.dump(mmwr_art_uni, open('mmwr_art_uni.pkl', 'xb'))
+# pickle.dump(eid_toc_uni, open('eid_toc_uni.pkl', 'xb'))
+# pickle.dump(eid_art_uni, open('eid_art_uni.pkl', 'xb'))
+# pickle.dump(pcd_toc_uni, open('pcd_toc_uni.pkl', 'xb'))
+# pickle.dump(pcd_art_uni, open('pcd_art_uni.pkl', 'xb'))
+# one content-addressed store for all collections and variants, from which
+# later scripts read only the documents they need
+DocStore('cdc_docs.sqlite', 'mmwr_toc', 'uni').update(mmwr_toc_uni)
+DocStore('cdc_docs.sqlite', 'mmwr_art', 'uni').update(mmwr_art_uni)
+DocStore('cdc_docs.sqlite', 'eid_toc', 'uni').update(eid_toc_uni)
+DocStore('cdc_docs.sqlite', 'eid_art', 'uni').update(eid_art_uni)
+DocStore('cdc_docs.sqlite', 'pcd_toc', 'uni').update(pcd_toc_uni)
+DocStore('cdc_docs.sqlite', 'pcd_art', 'uni').update(pcd_art_uni)
+
+#%% 4b. Retrieve dictionaries of UTF-8 HTML files
+# mmwr_toc_uni = pickle.load(open('pickle-files/mmwr_toc_uni.pkl', 'rb'))
+# mmwr_art_uni = pickle.load(open('pickle-files/mmwr_art_uni.pkl', 'rb'))
+# eid_toc_uni = pickle.load(open('pickle-files/eid_toc_uni.pkl', 'rb'))
+# eid_art_uni = pickle.load(open('pickle-files/eid_art_uni.pkl', 'rb'))
+# pcd_toc_uni = pickle.load(open('pickle-files/pcd_toc_uni.pkl', 'rb'))
+# pcd_art_uni = pickle.load(open('pickle-files/pcd_art_uni.pkl', 'rb'))
+mmwr_toc_uni = DocStore('pickle-files/cdc_docs.sqlite', 'mmwr_toc', 'uni')
+mmwr_art_uni = DocStore('pickle-files/cdc_docs.sqlite', 'mmwr_art', 'uni')
+eid_toc_uni = DocStore('pickle-files/cdc_docs.sqlite', 'eid_toc', 'uni')
+eid_art_uni = DocStore('pickle-files/cdc_docs.sqlite', 'eid_art', 'uni')
+pcd_toc_uni = DocStore('pickle-files/cdc_docs.sqlite', 'pcd_toc', 'uni')
+pcd_art_uni = DocStore('pickle-files/cdc_docs.sqlite', 'pcd_art', 'uni')
 
 #%% 5. Reduce space by trimming <svg> elements
 
@@ -441,43 +534,67 @@ pcd_art_uni = pickle.load(open('pickle-files/pcd_art_uni.pkl', 'rb'))
 #   remove attributes from all <svg> elements and their descendents
 #   remove strings from furthest descendents
 
-def trim_svg(html):
-    soup = BeautifulSoup(html, 'lxml')
-    if not re.search('<svg[ >]', html, flags=re.I):
-        return str(soup)
-    for svg_tag in soup.find_all('svg'):
-        for child in svg_tag.find_all(True):
-            child.attrs = dict()
-            if (not child.find(True)) and (child.string):
-                child.string = ""
-        svg_tag.attrs = dict()
-    return str(soup)
-
-mmwr_toc_unx = {path: trim_svg(html) for path, html in tqdm(mmwr_toc_uni.items())}
+# trim_svg is defined in html_transforms.py (and imported by 0_setup.py),
+# so that map_docs workers can import it
+# def trim_svg(html):
+#     soup = BeautifulSoup(html, 'lxml')
+#     if not re.search('<svg[ >]', html, flags=re.I):
+#         return str(soup)
+#     for svg_tag in soup.find_all('svg'):
+#         for child in svg_tag.find_all(True):
+#             child.attrs = dict()
+#             if (not child.find(True)) and (child.string):
+#                 child.string = ""
+#         svg_tag.attrs = dict()
+#     return str(soup)
+
+# mmwr_toc_unx = {path: trim_svg(html) for path, html in tqdm(mmwr_toc_uni.items())}
+mmwr_toc_unx = map_docs(trim_svg, mmwr_toc_uni)
 # 139/139 [00:01<00:00, 69.70it/s]
-mmwr_art_unx = {path: trim_svg(html) for path, html in tqdm(mmwr_art_uni.items())}
+# mmwr_art_unx = {path: trim_svg(html) for path, html in tqdm(mmwr_art_uni.items())}
+mmwr_art_unx = map_docs(trim_svg, mmwr_art_uni)
 # 15435/15435 [09:05<00:00, 28.27it/s]
-eid_toc_unx = {path: trim_svg(html) for path, html in tqdm(eid_toc_uni.items())}
+# eid_toc_unx = {path: trim_svg(html) for path, html in tqdm(eid_toc_uni.items())}
+eid_toc_unx = map_docs(trim_svg, eid_toc_uni)
 # 345/345 [00:16<00:00, 20.86it/s]
-eid_art_unx = {path: trim_svg(html) for path, html in tqdm(eid_art_uni.items())}
+# eid_art_unx = {path: trim_svg(html) for path, html in tqdm(eid_art_uni.items())}
+eid_art_unx = map_docs(trim_svg, eid_art_uni)
 # 13310/13310 [06:29<00:00, 34.20it/s]
-pcd_toc_unx = {path: trim_svg(html) for path, html in tqdm(pcd_toc_uni.items())}
+# pcd_toc_unx = {path: trim_svg(html) for path, html in tqdm(pcd_toc_uni.items())}
+pcd_toc_unx = map_docs(trim_svg, pcd_toc_uni)
 # 88/88 [00:01<00:00, 59.70it/s]
-pcd_art_unx = {path: trim_svg(html) for path, html in tqdm(pcd_art_uni.items())}
+# pcd_art_unx = {path: trim_svg(html) for path, html in tqdm(pcd_art_uni.items())}
+pcd_art_unx = map_docs(trim_svg, pcd_art_uni)
 # 5193/5193 [01:10<00:00, 73.65it/s]
 
-#%% 5a. Pickle dictionaries of reduced UTF-8 HTML files
-pickle.dump(mmwr_toc_unx, open('mmwr_toc_unx.pkl', 'xb'))
-pickle.dump(mmwr_art_unx, open('mmwr_art_unx.pkl', 'xb'))
-pickle.dump(eid_toc_unx, open('eid_toc_unx.pkl', 'xb'))
-pickle.dump(eid_art_unx, open('eid_art_unx.pkl', 'xb'))
-pickle.dump(pcd_toc_unx, open('pcd_toc_unx.pkl', 'xb'))
-pickle.dump(pcd_art_unx, open('pcd_art_unx.pkl', 'xb'))
-
-#%% 5b. Unpickle dictionaries of reduced UTF-8 HTML files
-mmwr_toc_unx = pickle.load(open('pickle-files/mmwr_toc_unx.pkl', 'rb'))
-mmwr_art_unx = pickle.load(open('pickle-files/mmwr_art_unx.pkl', 'rb'))
-eid_toc_unx = pickle.load(open('pickle-files/eid_toc_unx.pkl', 'rb'))
-eid_art_unx = pickle.load(open('pickle-files/eid_art_unx.pkl', 'rb'))
-pcd_toc_unx = pickle.load(open('pickle-files/pcd_toc_unx.pkl', 'rb'))
-pcd_art_unx = pickle.load(open('pickle-files/pcd_art_unx.pkl', 'rb'))
+#%% 5a. Store dictionaries of reduced UTF-8 HTML files
+# pickle.dump(mmwr_toc_unx, open('mmwr_toc_unx.pkl', 'xb'))
+# pickle.dump(mmwr_art_unx, open('mmwr_art_unx.pkl', 'xb'))
+# pickle.dump(eid_toc_unx, open('eid_toc_unx.pkl', 'xb'))
+# pickle.dump(eid_art_unx, open('eid_art_unx.pkl', 'xb'))
+# pickle.dump(pcd_toc_unx, open('pcd_toc_unx.pkl', 'xb'))
+# pickle.dump(pcd_art_unx, open('pcd_art_unx.pkl', 'xb'))
+# one content-addressed store for all collections and variants, from which
+# later scripts read only the documents they need
+DocStore('cdc_docs.sqlite', 'mmwr_toc', 'unx').update(mmwr_toc_unx)
+DocStore('cdc_docs.sqlite', 'mmwr_art', 'unx').update(mmwr_art_unx)
+DocStore('cdc_docs.sqlite', 'eid_toc', 'unx').update(eid_toc_unx)
+DocStore('cdc_docs.sqlite', 'eid_art', 'unx').update(eid_art_unx)
+DocStore('cdc_docs.sqlite', 'pcd_toc', 'unx').update(pcd_toc_unx)
+DocStore('cdc_docs.sqlite', 'pcd_art', 'unx').update(pcd_art_unx)
+# return space of replaced documents (e.g., from earlier runs) to filesystem
+DocStore('cdc_docs.sqlite', 'pcd_art', 'unx').vacuum()
+
+#%% 5b. Retrieve dictionaries of reduced UTF-8 HTML files
+# mmwr_toc_unx = pickle.load(open('pickle-files/mmwr_toc_unx.pkl', 'rb'))
+# mmwr_art_unx = pickle.load(open('pickle-files/mmwr_art_unx.pkl', 'rb'))
+# eid_toc_unx = pickle.load(open('pickle-files/eid_toc_unx.pkl', 'rb'))
+# eid_art_unx = pickle.load(open('pickle-files/eid_art_unx.pkl', 'rb'))
+# pcd_toc_unx = pickle.load(open('pickle-files/pcd_toc_unx.pkl', 'rb'))
+# pcd_art_unx = pickle.load(open('pickle-files/pcd_art_unx.pkl', 'rb'))
+mmwr_toc_unx = DocStore('pickle-files/cdc_docs.sqlite', 'mmwr_toc', 'unx')
+mmwr_art_unx = DocStore('pickle-files/cdc_docs.sqlite', 'mmwr_art', 'unx')
+eid_toc_unx = DocStore('pickle-files/cdc_docs.sqlite', 'eid_toc', 'unx')
+eid_art_unx = DocStore('pickle-files/cdc_docs.sqlite', 'eid_art', 'unx')
+pcd_toc_unx = DocStore('pickle-files/cdc_docs.sqlite', 'pcd_toc', 'unx')
+pcd_art_unx = DocStore('pickle-files/cdc_docs.sqlite', 'pcd_art', 'unx')
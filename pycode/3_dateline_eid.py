@@ -32,8 +32,10 @@ eid_cc_df = pd.read_pickle('pickle-files/eid_cc_df.pkl')
 eid_cc_df['mirror_path'] = eid_cc_df['mirror_path'].str.replace('\\', '/')
 eid_cc_paths = eid_cc_df.mirror_path.to_list()
 
-eid_toc_unx = pickle.load(open('pickle-files/eid_toc_unx.pkl', 'rb'))
-eid_art_unx = pickle.load(open('pickle-files/eid_art_unx.pkl', 'rb'))
+# eid_toc_unx = pickle.load(open('pickle-files/eid_toc_unx.pkl', 'rb'))
+eid_toc_unx = DocStore('pickle-files/cdc_docs.sqlite', 'eid_toc', 'unx')
+# eid_art_unx = pickle.load(open('pickle-files/eid_art_unx.pkl', 'rb'))
+eid_art_unx = DocStore('pickle-files/cdc_docs.sqlite', 'eid_art', 'unx')
 
 
 #%% EID
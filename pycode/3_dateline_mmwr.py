@@ -33,8 +33,10 @@ mmwr_cc_df = pd.read_pickle('pickle-files/mmwr_cc_df.pkl')
 mmwr_cc_df['mirror_path'] = mmwr_cc_df['mirror_path'].str.replace('\\', '/')
 mmwr_cc_paths = mmwr_cc_df.mirror_path.to_list() # 5179
 
-mmwr_toc_unx = pickle.load(open('pickle-files/mmwr_toc_unx.pkl', 'rb'))
-mmwr_art_unx = pickle.load(open('pickle-files/mmwr_art_unx.pkl', 'rb'))
+# mmwr_toc_unx = pickle.load(open('pickle-files/mmwr_toc_unx.pkl', 'rb'))
+mmwr_toc_unx = DocStore('pickle-files/cdc_docs.sqlite', 'mmwr_toc', 'unx')
+# mmwr_art_unx = pickle.load(open('pickle-files/mmwr_art_unx.pkl', 'rb'))
+mmwr_art_unx = DocStore('pickle-files/cdc_docs.sqlite', 'mmwr_art', 'unx')
 
 #%% MMWR
 """
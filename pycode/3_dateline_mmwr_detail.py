@@ -40,7 +40,8 @@ from dateutil.parser import parse as parse_date
 os.chdir('/Users/cmheilig/cdc-corpora/_test')
 
 #%% 1. Retrieve (unpickle) trimmed, UTF-8 HTML
-mmwr_art_unx = pickle.load(open('pickle-files/mmwr_art_unx.pkl', 'rb'))
+# mmwr_art_unx = pickle.load(open('pickle-files/mmwr_art_unx.pkl', 'rb'))
+mmwr_art_unx = DocStore('pickle-files/cdc_docs.sqlite', 'mmwr_art', 'unx')
 
 mmwr_art_soup = {
     path: BeautifulSoup(html, 'lxml')
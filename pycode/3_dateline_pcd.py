@@ -39,8 +39,10 @@ pcd_art_nen_paths = [
     path for path in pcd_cc_paths
     if re.search(r'\d{2}_\d{4}[aber\d]{0,2}_(es|fr|zhs|zht)\.htm', path)] # 2080
 
-pcd_toc_unx = pickle.load(open('pickle-files/pcd_toc_unx.pkl', 'rb'))
-pcd_art_unx = pickle.load(open('pickle-files/pcd_art_unx.pkl', 'rb'))
+# pcd_toc_unx = pickle.load(open('pickle-files/pcd_toc_unx.pkl', 'rb'))
+pcd_toc_unx = DocStore('pickle-files/cdc_docs.sqlite', 'pcd_toc', 'unx')
+# pcd_art_unx = pickle.load(open('pickle-files/pcd_art_unx.pkl', 'rb'))
+pcd_art_unx = DocStore('pickle-files/cdc_docs.sqlite', 'pcd_art', 'unx')
 
 #%% PCD soup
 """
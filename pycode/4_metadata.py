@@ -44,12 +44,18 @@ eid_cc_df['mirror_path'] = eid_cc_df['mirror_path'].str.replace('\\', '/')
 pcd_cc_df = pd.read_pickle('pickle-files/pcd_cc_df.pkl')
 pcd_cc_df['mirror_path'] = pcd_cc_df['mirror_path'].str.replace('\\', '/')
 
-mmwr_toc_unx = pickle.load(open('pickle-files/mmwr_toc_unx.pkl', 'rb'))
-mmwr_art_unx = pickle.load(open('pickle-files/mmwr_art_unx.pkl', 'rb'))
-eid_toc_unx = pickle.load(open('pickle-files/eid_toc_unx.pkl', 'rb'))
-eid_art_unx = pickle.load(open('pickle-files/eid_art_unx.pkl', 'rb'))
-pcd_toc_unx = pickle.load(open('pickle-files/pcd_toc_unx.pkl', 'rb'))
-pcd_art_unx = pickle.load(open('pickle-files/pcd_art_unx.pkl', 'rb'))
+# mmwr_toc_unx = pickle.load(open('pickle-files/mmwr_toc_unx.pkl', 'rb'))
+mmwr_toc_unx = DocStore('pickle-files/cdc_docs.sqlite', 'mmwr_toc', 'unx')
+# mmwr_art_unx = pickle.load(open('pickle-files/mmwr_art_unx.pkl', 'rb'))
+mmwr_art_unx = DocStore('pickle-files/cdc_docs.sqlite', 'mmwr_art', 'unx')
+# eid_toc_unx = pickle.load(open('pickle-files/eid_toc_unx.pkl', 'rb'))
+eid_toc_unx = DocStore('pickle-files/cdc_docs.sqlite', 'eid_toc', 'unx')
+# eid_art_unx = pickle.load(open('pickle-files/eid_art_unx.pkl', 'rb'))
+eid_art_unx = DocStore('pickle-files/cdc_docs.sqlite', 'eid_art', 'unx')
+# pcd_toc_unx = pickle.load(open('pickle-files/pcd_toc_unx.pkl', 'rb'))
+pcd_toc_unx = DocStore('pickle-files/cdc_docs.sqlite', 'pcd_toc', 'unx')
+# pcd_art_unx = pickle.load(open('pickle-files/pcd_art_unx.pkl', 'rb'))
+pcd_art_unx = DocStore('pickle-files/cdc_docs.sqlite', 'pcd_art', 'unx')
 
 mmwr_toc_dl_df = pd.read_pickle('pickle-files/mmwr_toc_dl_df.pkl')
 mmwr_art_dl_df = pd.read_pickle('pickle-files/mmwr_art_dl_df.pkl')
@@ -543,3 +549,25 @@ cdc_corpus_df.to_csv('cdc_corpus_df.csv', index=False, quoting=csv.QUOTE_NONNUME
 
 json.dump(cdc_corpus_df.to_dict(orient='records'),
           open('cdc_corpus_df.json', 'x'))
+
+#%% Reconcile canonical links with redirects observed while mirroring
+# redirect maps (url -> final_url), where 1_mirror_*.py save them: in each
+# journal's working directory, or one for all from 1_mirror_all.py; maps 
+# not found are skipped. A canonical link that matches neither the URL nor
+# its final URL merits review
+cdc_redirect_df = redirect_dframe([
+    r'C:\Temp\mmwr_2024\mmwr_redirects.json',
+    r'C:\Temp\eid_2024\eid_redirects.json',
+    r'C:\Temp\pcd_2024\pcd_redirects.json',
+    r'C:\Temp\mirror_2024\cdc_redirects.json'])
+canon_df = cdc_corpus_df[['url', 'link_canon', 'mirror_path']]\
+    .merge(cdc_redirect_df, on='url', how='left')
+canon_df['final_url'] = canon_df['final_url'].fillna(canon_df['url'])
+canon_norm = canon_df['link_canon'].str.replace(r'^https?:', 'https:', regex=True)
+canon_df['canon_match'] = (
+    (canon_df['link_canon'] == '') | 
+    (canon_norm == canon_df['url']) | (canon_norm == canon_df['final_url']))
+canon_df['redirected'] = canon_df['final_url'] != canon_df['url']
+pd.crosstab(canon_df.redirected, canon_df.canon_match)
+# canon_df.loc[~canon_df.canon_match]\
+#     .to_excel('cdc_canon_review.xlsx', freeze_panes=(1,0))
@@ -16,17 +16,24 @@ only_head = SoupStrainer(name='head')
 
 os.chdir('/Users/cmheilig/cdc-corpora/_test')
 
-#%% Retrieve (unpickle) trimmed, UTF-8 HTML
+#%% Retrieve trimmed, UTF-8 HTML
+# read into memory (dict), as sections below combine TOC and article documents
 # mmwr_cc_df = pickle.load(open("pickle-files/mmwr_cc_df.pkl", "rb")) # 
 # eid_cc_df = pickle.load(open("pickle-files/eid_cc_df.pkl", "rb")) # 
 # eid_cc_df = pickle.load(open("pickle-files/eid_cc_df.pkl", "rb")) # 
 
-mmwr_toc_unx = pickle.load(open('pickle-files/mmwr_toc_unx.pkl', 'rb'))
-mmwr_art_unx = pickle.load(open('pickle-files/mmwr_art_unx.pkl', 'rb'))
-eid_toc_unx = pickle.load(open('pickle-files/eid_toc_unx.pkl', 'rb'))
-eid_art_unx = pickle.load(open('pickle-files/eid_art_unx.pkl', 'rb'))
-pcd_toc_unx = pickle.load(open('pickle-files/pcd_toc_unx.pkl', 'rb'))
-pcd_art_unx = pickle.load(open('pickle-files/pcd_art_unx.pkl', 'rb'))
+# mmwr_toc_unx = pickle.load(open('pickle-files/mmwr_toc_unx.pkl', 'rb'))
+mmwr_toc_unx = dict(DocStore('pickle-files/cdc_docs.sqlite', 'mmwr_toc', 'unx').items())
+# mmwr_art_unx = pickle.load(open('pickle-files/mmwr_art_unx.pkl', 'rb'))
+mmwr_art_unx = dict(DocStore('pickle-files/cdc_docs.sqlite', 'mmwr_art', 'unx').items())
+# eid_toc_unx = pickle.load(open('pickle-files/eid_toc_unx.pkl', 'rb'))
+eid_toc_unx = dict(DocStore('pickle-files/cdc_docs.sqlite', 'eid_toc', 'unx').items())
+# eid_art_unx = pickle.load(open('pickle-files/eid_art_unx.pkl', 'rb'))
+eid_art_unx = dict(DocStore('pickle-files/cdc_docs.sqlite', 'eid_art', 'unx').items())
+# pcd_toc_unx = pickle.load(open('pickle-files/pcd_toc_unx.pkl', 'rb'))
+pcd_toc_unx = dict(DocStore('pickle-files/cdc_docs.sqlite', 'pcd_toc', 'unx').items())
+# pcd_art_unx = pickle.load(open('pickle-files/pcd_art_unx.pkl', 'rb'))
+pcd_art_unx = dict(DocStore('pickle-files/cdc_docs.sqlite', 'pcd_art', 'unx').items())
 
 # mmwr_toc_dl_df = pd.read_pickle('mmwr_toc_dl_df.pkl')
 # mmwr_art_dl_df = pd.read_pickle('mmwr_art_dl_df.pkl')
@@ -46,12 +46,18 @@ eid_cc_df['mirror_path'] = eid_cc_df['mirror_path'].str.replace('\\', '/')
 pcd_cc_df = pd.read_pickle('pickle-files/pcd_cc_df.pkl')
 pcd_cc_df['mirror_path'] = pcd_cc_df['mirror_path'].str.replace('\\', '/')
 
-mmwr_toc_unx = pickle.load(open('pickle-files/mmwr_toc_unx.pkl', 'rb'))
-mmwr_art_unx = pickle.load(open('pickle-files/mmwr_art_unx.pkl', 'rb'))
-eid_toc_unx = pickle.load(open('pickle-files/eid_toc_unx.pkl', 'rb'))
-eid_art_unx = pickle.load(open('pickle-files/eid_art_unx.pkl', 'rb'))
-pcd_toc_unx = pickle.load(open('pickle-files/pcd_toc_unx.pkl', 'rb'))
-pcd_art_unx = pickle.load(open('pickle-files/pcd_art_unx.pkl', 'rb'))
+# mmwr_toc_unx = pickle.load(open('pickle-files/mmwr_toc_unx.pkl', 'rb'))
+mmwr_toc_unx = DocStore('pickle-files/cdc_docs.sqlite', 'mmwr_toc', 'unx')
+# mmwr_art_unx = pickle.load(open('pickle-files/mmwr_art_unx.pkl', 'rb'))
+mmwr_art_unx = DocStore('pickle-files/cdc_docs.sqlite', 'mmwr_art', 'unx')
+# eid_toc_unx = pickle.load(open('pickle-files/eid_toc_unx.pkl', 'rb'))
+eid_toc_unx = DocStore('pickle-files/cdc_docs.sqlite', 'eid_toc', 'unx')
+# eid_art_unx = pickle.load(open('pickle-files/eid_art_unx.pkl', 'rb'))
+eid_art_unx = DocStore('pickle-files/cdc_docs.sqlite', 'eid_art', 'unx')
+# pcd_toc_unx = pickle.load(open('pickle-files/pcd_toc_unx.pkl', 'rb'))
+pcd_toc_unx = DocStore('pickle-files/cdc_docs.sqlite', 'pcd_toc', 'unx')
+# pcd_art_unx = pickle.load(open('pickle-files/pcd_art_unx.pkl', 'rb'))
+pcd_art_unx = DocStore('pickle-files/cdc_docs.sqlite', 'pcd_art', 'unx')
 
 #%% Parse HTML <head> elements
 
@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Transforms of stage 2 (2_html.py), applied to each document independently
+
+@author: cmheilig
+
+Defined here, rather than in 0_setup.py or 2_html.py (which run in the 
+console, as __main__), so that worker processes started by map_docs can
+import them on any platform; 0_setup.py imports all of them.
+"""
+
+import re
+import html
+from bs4 import BeautifulSoup
+
+# Decode from raw HTML using the following epmirically derived algorithm
+# based on the <meta> element's charset attribute
+# In this order, search and apply 'utf-8', 'iso-8859-1', 'windows'1252'
+#     If none is present, use 'windows-1252'
+# See https://docs.python.org/3/library/codecs.html#standard-encodings
+# meta_win_reb = re.compile(rb'<meta.*charset="?windows-1252.*>', flags=re.M|re.I)
+# Declarations are in <head>, near the start of each document, so only a
+# bounded prefix is searched, once, for any of the declared character sets
+# (as before, a <meta> element on a single line); the declaration earliest
+# in the order above determines the codec. ASCII-only documents decode the
+# same under every candidate codec, so they are decoded as ASCII, whatever
+# they declare.
+META_CHARSET_CODECS = {b'utf-8': 'utf_8', b'iso-8859-1': 'latin_1',
+   b'gb2312': 'gb2312', b'big5': 'big5'} # simplified, traditional Chinese
+META_CHARSET_PREFIX = 8192
+meta_charsets_reb = re.compile(
+   rb'<meta[^\n]*?charset="?(utf-8|iso-8859-1|gb2312|big5)(?=[^\n]*>)', 
+   flags=re.I)
+
+def sniff_charset_b(str_b, prefix=META_CHARSET_PREFIX):
+   """
+   Determine codec of raw HTML from its <meta> charset declarations.
+
+   Parameters
+   str_b : bytes
+      raw HTML
+   prefix : int or None
+      number of bytes to search for declarations (None: whole document)
+
+   Returns
+   tuple (str, str)
+      codec and rule: rule is the declared charset that determines codec 
+      ('utf-8', 'iso-8859-1', 'gb2312', 'big5') or 'none' if none is 
+      declared (codec 'cp1252'); codec is 'ascii' for ASCII-only documents,
+      whatever they declare
+   """
+   rules = list(META_CHARSET_CODECS)
+   found = None
+   for match in meta_charsets_reb.finditer(str_b, 0, prefix or len(str_b)):
+      rule = match.group(1).lower()
+      if found is None or rules.index(rule) < rules.index(found):
+         found = rule
+         if found == rules[0]:
+            break
+   rule = 'none' if found is None else found.decode()
+   if str_b.isascii():
+      return 'ascii', rule
+   return META_CHARSET_CODECS.get(found, 'cp1252'), rule
+
+def html_to_unicode_b(str_b, try_=False, rules=None):
+   """
+   Convert raw HTML (bytes) to Unicode HTML (str).
+
+   Parameters
+   str_b : bytes
+      raw HTML
+   try_ : bool
+      report whether decoding with declared codec is strict
+   rules : Counter or None
+      if given, counts declared charset (rule, see sniff_charset_b); counted
+      only in this process, not by map_docs workers
+
+   Returns
+   str
+      Unicode HTML
+   """
+   # str_u = UnicodeDammit(str_b, ['utf-8', 'windows-1252']).unicode_markup
+   codec, rule = sniff_charset_b(str_b)
+   if rules is not None:
+      rules[rule] += 1
+   if codec == 'ascii':
+      return str_b.decode('ascii')
+   if try_:
+      try:
+         str_u = str_b.decode(encoding=codec, errors='strict')
+      except UnicodeDecodeError as e:
+         print(f'UnicodeDecodeError {e} [{e.start}:{e.end}]\n')
+   str_u = str_b.decode(encoding=codec, errors='backslashreplace')
+   return str_u
+
+# Small utilities to separate sequence of operations on HTML
+# x_b take bytes; x_u take strings (UTF-8)
+# sub(' ?(<|>) ?', r'\1') works in well-formed HTML
+
+# example: minim=r'<pre[ >]'
+def html_reduce_space_u(str_u, minim=None):
+    # compiled regular expressions are cached, making repeated calls efficient
+   # universal newlines, except for '\n'
+   newln_re = re.compile('[\n\x0b\x0c\r\x1c\x1d\x1e\x85\u2028\u2029]', flags=re.M)
+   # everything that matches Unicode '\s' except ' ' and universal newlines
+   space_re = re.compile('[\t\x1f\xa0\u1680\u2000\u2001\u2002\u2003\u2004\u2005'
+      '\u2006\u2007\u2008\u2009\u200a\u202f\u205f\u3000]', flags=re.M)
+   min_sp_re = re.compile('^ +(?=<)|( *$)', flags=re.M) # remove space before < or $
+   mult_sp_re = re.compile(' {2,}')#, flags=re.M) # replace 2+ space with 1
+   end_sp_re = re.compile('(^ *)|( *$)', flags=re.M) # remove space on either end
+   mult_nl_re = re.compile('\n{3,}', flags=re.M) # replace 3+ newline with 2
+
+   # str_u = re.sub(r'\s+', ' ', str_u) # \s includes newlines and other spaces
+   str_u = space_re.sub(' ', str_u)      # replace alt-spaces with ' '
+   str_u = str_u.replace('\r\n', '\n')   # replace '\r\n' with '\n'
+   str_u = newln_re.sub('\n', str_u)     # replace alt-newlines with '\n'
+   # remove some whitespace when <pre> is present, more when it's not
+   if minim and re.search(minim, str_u, flags=re.I):
+      str_u = min_sp_re.sub('', str_u)   # remove space before < or line-end
+   else:
+      str_u = mult_sp_re.sub(' ', str_u) # 2+ spaces -> ' '
+      str_u = end_sp_re.sub('', str_u)   # empty line
+   str_u = mult_nl_re.sub('\n\n', str_u) # 3+ newlines -> \n\n
+   return str_u
+
+# Resolve character and numeric entity references (see section 4 of 
+# 2_html.py for their frequencies)
+def ent_repair(html_u):
+   # &thinsp; is sometimes large-number delimiter
+   if '&thinsp;' in html_u:
+      html_u = re.sub(r'&thinsp;(?=\d{3})', ',', html_u) # comma for thousands
+   # entities to replace or delete; spaces will be converted and reduced
+   html_u = (html_u
+      .replace('&#129;', '&uuml;')  # Cc -> LATIN SMALL LETTER U WITH DIAERESIS
+      .replace('&#157;', '')        # OPERATING SYSTEM COMMAND
+      .replace('&#822;', '&ndash;') # COMBINING LONG STROKE OVERLAY -> EN DASH
+      .replace('&#1467;', '')       # HEBREW POINT QUBUTS
+      .replace('&#1560;', '')       # ARABIC SMALL FATHA
+      .replace('&#8203;', '')       # ZERO WIDTH SPACE
+      .replace('&lrm;', '')         # LEFT-TO-RIGHT MARK
+      .replace('&rlm;', '')         # LEFT-TO-RIGHT MARK
+      .replace('&#8288;', '')       # WORD JOINER
+      .replace('&#8289;', '')       # FUNCTION APPLICATION
+      .replace('&#11834;', '&mdash;') # TWO-EM DASH -> EM DASH
+      .replace('&#61620;', '&times;') # MULTIPLICATION SIGN
+      .replace('&#65533;', ''))     # REPLACEMENT CHARACTER
+   html_u = html.unescape(html_u)
+   return html_u
+
+def ent_repair_reduce(html_u, minim=None):
+   return html_reduce_space_u(ent_repair(html_u), minim=minim)
+
+# If <SVG> tag is present, for each <svg> element,
+#   remove attributes from all <svg> elements and their descendents
+#   remove strings from furthest descendents
+def trim_svg(html):
+   soup = BeautifulSoup(html, 'lxml')
+   if not re.search('<svg[ >]', html, flags=re.I):
+      return str(soup)
+   for svg_tag in soup.find_all('svg'):
+      for child in svg_tag.find_all(True):
+         child.attrs = dict()
+         if (not child.find(True)) and (child.string):
+            child.string = ""
+      svg_tag.attrs = dict()
+   return str(soup)